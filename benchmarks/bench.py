@@ -0,0 +1,368 @@
+# benchmarks/bench.py
+# Reproducible benchmarks for the Reke SDK and the platform API.
+#
+#   python benchmarks/bench.py sdk --out sdk.json          # SDK embed/verify
+#   python benchmarks/bench.py api --out api.json          # in-process load test
+#   python benchmarks/bench.py cold                        # import + first-request budgets
+#   python benchmarks/bench.py all --quick --out all.json
+#   python benchmarks/compare.py base.json new.json
+#
+# Inputs are synthetic and seeded, so two commits see identical bytes.
+import os, sys, io, json, time, shutil, inspect, platform, argparse, asyncio, statistics, subprocess, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(ROOT, "platform_api")
+sys.path.insert(0, API_DIR)
+
+import numpy as np
+from PIL import Image
+
+# name -> (width, height)
+SIZES = {
+    "tiny": (64, 64),
+    "vga": (640, 480),
+    "2mp": (1920, 1080),
+    "12mp": (4000, 3000),
+    "50mp": (8660, 5774),
+}
+QUICK_SIZES = ("tiny", "vga", "2mp")
+
+def _percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    k = (len(ordered) - 1) * pct / 100.0
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+def summarize(samples) -> dict:
+    """Latency summary in milliseconds."""
+    ms = [s * 1000.0 for s in samples]
+    return {"n": len(ms), "min_ms": min(ms), "p50_ms": _percentile(ms, 50), "p95_ms": _percentile(ms, 95),
+            "p99_ms": _percentile(ms, 99), "mean_ms": statistics.fmean(ms)}
+
+def time_call(fn, repeat: int, warmup: int = 1) -> dict:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples)
+
+def synthetic_image(size, seed: int) -> Image.Image:
+    """Smooth gradient plus seeded noise: compresses like a photo, not like flat colour or pure noise."""
+    w, h = size
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, w, dtype=np.float32)[None, :]
+    y = np.linspace(0, 255, h, dtype=np.float32)[:, None]
+    base = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    noise = rng.normal(0, 12, size=(h, w, 3)).astype(np.float32)
+    return Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8), "RGB")
+
+def _encode(img: Image.Image, fmt: str, **kw) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, fmt, **kw)
+    return buf.getvalue()
+
+def _sdk():
+    import sdk.reke_sdk as sdk
+    return sdk
+
+def _accepts(fn, name: str) -> bool:
+    return name in inspect.signature(fn).parameters
+
+def build_image_inputs(workdir: str, sizes, seed: int) -> dict:
+    """{(size, fmt, watermarked): (path, bytes)} for PNG/JPEG, clean and watermarked."""
+    sdk = _sdk()
+    # the JPEG comment prefix is the wire format; older SDKs only have it as a literal
+    prefix = getattr(sdk, "MANIFEST_PREFIX", "REKE_MANIFEST:")
+    inputs = {}
+    for i, name in enumerate(sizes):
+        img = synthetic_image(SIZES[name], seed + i)
+        clean_png = os.path.join(workdir, f"{name}.png")
+        img.save(clean_png, "PNG")
+        marked_png = sdk.embed_image_treering(clean_png, os.path.join(workdir, f"{name}.reke.png"), origin="bench")
+        clean_jpg = _encode(img, "JPEG", quality=90)
+        manifest = sdk._build_manifest("bench", sdk._content_hash_bytes(clean_jpg))
+        marked_jpg = _encode(img, "JPEG", quality=90, comment=(prefix + json.dumps(manifest)).encode())
+        inputs[(name, "png", False)] = (clean_png, open(clean_png, "rb").read())
+        inputs[(name, "png", True)] = (marked_png, open(marked_png, "rb").read())
+        inputs[(name, "jpeg", False)] = (None, clean_jpg)
+        inputs[(name, "jpeg", True)] = (None, marked_jpg)
+    return inputs
+
+def _repeat_for(size_name: str, repeat: int) -> int:
+    # keep multi-megapixel cases bounded in wall time
+    w, h = SIZES[size_name]
+    return max(3, min(repeat, int(repeat * 2_000_000 / (w * h)) or 3))
+
+def bench_sdk(args) -> list:
+    """SDK cases; entry points missing from the SDK under test (older commits) are reported as skipped."""
+    sdk = _sdk()
+    embed_image, embed_images = getattr(sdk, "embed_image", None), getattr(sdk, "embed_images", None)
+    ring_scores, PerceptualIndex = getattr(sdk, "ring_scores", None), getattr(sdk, "PerceptualIndex", None)
+    verify_image_treering = sdk.verify_image_treering
+    results = []
+    sizes = QUICK_SIZES if args.quick else tuple(args.sizes or SIZES)
+    with tempfile.TemporaryDirectory(prefix="reke-bench-") as workdir:
+        inputs = build_image_inputs(workdir, sizes, args.seed)
+        for name in sizes:
+            repeat = _repeat_for(name, args.repeat)
+            src = inputs[(name, "png", False)][0]
+            out = os.path.join(workdir, f"{name}.out.png")
+            stats = time_call(lambda: sdk.embed_image_treering(src, out, origin="bench"), repeat)
+            results.append(dict(name="embed_image_treering", size=name, format="png", watermarked=False, **stats))
+            # in memory, per PNG encode preset (the encoder, not the watermark, dominates embed cost)
+            data = inputs[(name, "png", False)][1]
+            for preset in ("fast", "default"):
+                if embed_image is None:
+                    results.append(dict(name=f"embed_image({preset})", size=name, skipped="not in this SDK"))
+                    continue
+                stats = time_call(lambda: embed_image(data, origin="bench", compression=preset), repeat)
+                results.append(dict(name=f"embed_image({preset})", size=name, format="png", watermarked=False,
+                                    **stats))
+            if embed_images is None:
+                results.append(dict(name="embed_images x8", size=name, skipped="not in this SDK"))
+            else:
+                stats = time_call(lambda: embed_images([data] * 8, origin="bench"), max(1, repeat // 4))
+                results.append(dict(name="embed_images x8", size=name, format="png", watermarked=False, **stats))
+            for fmt in ("png", "jpeg"):
+                for marked in (False, True):
+                    data = inputs[(name, fmt, marked)][1]
+                    stats = time_call(lambda: verify_image_treering(data), repeat)
+                    results.append(dict(name="verify_image_treering", size=name, format=fmt, watermarked=marked,
+                                        bytes=len(data), **stats))
+            # no manifest -> frequency ring fallback; cost should stay flat across sizes
+            data = inputs[(name, "jpeg", False)][1]
+            if not _accepts(verify_image_treering, "rings"):
+                results.append(dict(name="verify_image_treering(rings)", size=name, skipped="not in this SDK"))
+                continue
+            stats = time_call(lambda: verify_image_treering(data, rings=True), repeat)
+            results.append(dict(name="verify_image_treering(rings)", size=name, format="jpeg", watermarked=False,
+                                bytes=len(data), **stats))
+        if ring_scores is None:
+            results.append(dict(name="ring_scores x64", skipped="not in this SDK"))
+        else:
+            planes = np.random.default_rng(args.seed).normal(size=(64, sdk.RING_SIZE, sdk.RING_SIZE))
+            planes = planes.astype(np.float32)
+            stats = time_call(lambda: ring_scores(planes), args.repeat)
+            results.append(dict(name="ring_scores x64", size=f"{sdk.RING_SIZE}px", **stats))
+        # perceptual index lookup (hash 8 bits away from a stored one); should stay flat as the table grows
+        if PerceptualIndex is None:
+            results.append(dict(name="PerceptualIndex.lookup x64", skipped="not in this SDK"))
+        else:
+            rng = np.random.default_rng(args.seed)
+            entries = 100_000 if args.quick else 1_000_000
+            hashes = [int(h) for h in rng.integers(0, 1 << 64, entries, dtype=np.uint64)]
+            index = PerceptualIndex(os.path.join(workdir, "phash.db"))
+            index.add_many((h, {}) for h in hashes)
+            queries = [h ^ 0xFF for h in hashes[:: max(1, entries // 64)]]
+            stats = time_call(lambda: [index.lookup(q, 8) for q in queries], args.repeat)
+            results.append(dict(name="PerceptualIndex.lookup x64", size=f"{entries // 1000}k", **stats))
+        results += bench_video(workdir, args)
+    return results
+
+def bench_video(workdir: str, args) -> list:
+    sdk = _sdk()
+    ffmpeg, ffprobe = getattr(sdk, "FFMPEG", "ffmpeg"), getattr(sdk, "FFPROBE", "ffprobe")
+    if not (shutil.which(ffmpeg) and shutil.which(ffprobe)):
+        return [{"name": "embed_video_hybrid", "skipped": "ffmpeg/ffprobe not found"}]
+    results = []
+    clean = os.path.join(workdir, "clip.mp4")
+    subprocess.run([ffmpeg, "-v", "error", "-y", "-f", "lavfi", "-i", "testsrc=size=640x360:rate=25",
+                    "-t", str(args.video_seconds), "-pix_fmt", "yuv420p", clean], check=True)
+    marked = os.path.join(workdir, "clip.reke.mp4")
+    stats = time_call(lambda: sdk.embed_video_hybrid(clean, marked, origin="bench"), max(1, args.repeat // 10),
+                      warmup=0)
+    results.append(dict(name="embed_video_hybrid", size="640x360", seconds=args.video_seconds, **stats))
+    for label, path in (("clean", clean), ("watermarked", marked)):
+        stats = time_call(lambda: sdk.verify_video_hybrid(path), args.repeat)
+        results.append(dict(name="verify_video_hybrid", size="640x360", watermarked=label == "watermarked", **stats))
+    verify_video_frames = getattr(sdk, "verify_video_frames", None)
+    if verify_video_frames is None:
+        results.append(dict(name="verify_video_frames", size="640x360", skipped="not in this SDK"))
+        return results
+    # metadata stripped by a remux: only frame sampling can tell; clean clips use the whole frame budget
+    stripped = os.path.join(workdir, "clip.strip.mp4")
+    subprocess.run([ffmpeg, "-v", "error", "-y", "-i", marked, "-map_metadata", "-1", "-c", "copy", stripped], check=True)
+    for label, path in (("clean", clean), ("watermarked", stripped)):
+        stats = time_call(lambda: verify_video_frames(path), max(3, args.repeat // 4))
+        results.append(dict(name="verify_video_frames", size="640x360", watermarked=label == "watermarked", **stats))
+    return results
+
+# ----- API load generator (in-process, no sockets) -----
+async def _load(client, make_request, concurrency: int, total: int) -> dict:
+    latencies, errors, issued = [], 0, 0
+
+    async def worker():
+        nonlocal errors, issued
+        while issued < total:
+            issued += 1
+            t0 = time.perf_counter()
+            try:
+                r = await make_request(client)
+                if r.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - t0
+    stats = summarize(latencies)
+    return dict(stats, throughput_rps=len(latencies) / elapsed, errors=errors, concurrency=concurrency)
+
+def bench_api(args) -> list:
+    if not args.cache:
+        os.environ["REKE_CACHE_TTL"] = "0"  # every request does the full verification
+    os.environ.setdefault("REKE_IMAGE_QUEUE", str(args.concurrency * 4))
+    with tempfile.TemporaryDirectory(prefix="reke-bench-") as workdir:
+        return _bench_api(args, workdir)
+
+def _bench_api(args, workdir: str) -> list:
+    # a checkout ships no samples: seed a directory so /sample/{filename} is measured on every commit
+    samples_dir = os.path.join(workdir, "samples")
+    os.makedirs(samples_dir)
+    inputs = build_image_inputs(workdir, ("vga", "2mp"), args.seed)
+    sample = "bench.reke.png"
+    shutil.copyfile(inputs[("vga", "png", True)][0], os.path.join(samples_dir, sample))
+    os.environ["REKE_SAMPLES_DIR"] = samples_dir
+    os.environ["REKE_LEDGER_DB"] = os.path.join(workdir, "ledger.db")  # never the checkout's data/
+    import httpx
+    import app as api
+    api.SAMPLES_DIR = samples_dir  # older apps read the module global and ignore the variable
+
+    cases = [("GET /samples", lambda c: c.get("/samples")),
+             ("GET /sample/{filename}", lambda c: c.get(f"/sample/{sample}"))]
+    for (size, fmt, marked), (_, data) in sorted(inputs.items()):
+        mime = "image/png" if fmt == "png" else "image/jpeg"
+        label = f"POST /verify/ {size} {fmt} {'watermarked' if marked else 'clean'}"
+        cases.append((label, lambda c, data=data, mime=mime, fmt=fmt: c.post(
+            "/verify/", files={"file": (f"bench.{fmt}", data, mime)})))
+    # shared-memory counters/histograms summed across worker slots
+    if "/metrics/prometheus" in {getattr(r, "path", None) for r in api.app.routes}:
+        cases.append(("GET /metrics/prometheus", lambda c: c.get("/metrics/prometheus")))
+
+    async def run_all():
+        results = []
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for label, make_request in cases:
+                await _load(client, make_request, 1, 3)  # warm-up
+                stats = await _load(client, make_request, args.concurrency, args.requests)
+                results.append(dict(name=label, requests=args.requests, **stats))
+        return results
+
+    return asyncio.run(run_all())
+
+# ----- Cold start -----
+# p50 budgets (ms) for a fresh interpreter; `cold` exits non-zero when one is exceeded
+COLD_BUDGETS_MS = {
+    "import sdk.reke_sdk": 350,
+    "import app": 1000,
+    "first POST /verify/": 150,
+    "warm_up": 400,
+    "first POST /verify/ (warmed)": 40,
+}
+
+# runs in a new interpreter: argv = [image path, "warm" | "lazy"]
+_COLD_PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+import sdk.reke_sdk
+t1 = time.perf_counter()
+import app
+t2 = time.perf_counter()
+import asyncio, httpx
+times = {"import sdk.reke_sdk": t1 - t0, "import app": t2 - t1}
+if sys.argv[2] == "warm":
+    t = time.perf_counter()
+    app.warm_up()
+    times["warm_up"] = time.perf_counter() - t
+data = open(sys.argv[1], "rb").read()
+
+async def first_request():
+    transport = httpx.ASGITransport(app=app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        t = time.perf_counter()
+        r = await client.post("/verify/", files={"file": ("cold.png", data, "image/png")})
+        assert r.status_code == 200, r.text
+        return time.perf_counter() - t
+
+first = asyncio.run(first_request())
+times["first POST /verify/" + (" (warmed)" if sys.argv[2] == "warm" else "")] = first
+print(json.dumps(times))
+"""
+
+def bench_cold(args) -> list:
+    """Import time and first-request latency, each run in a fresh interpreter (no warm-up vs after warm_up())."""
+    samples = {}
+    with tempfile.TemporaryDirectory(prefix="reke-bench-") as workdir:
+        image = build_image_inputs(workdir, ("vga",), args.seed)[("vga", "png", True)][0]
+        env = dict(os.environ, REKE_LEDGER_DB=os.path.join(workdir, "ledger.db"), REKE_CACHE_TTL="0",
+                   PYTHONDONTWRITEBYTECODE="1")
+        for run in range(args.cold_runs):
+            for mode in ("lazy", "warm"):
+                p = subprocess.run([sys.executable, "-c", _COLD_PROBE, image, mode], cwd=API_DIR, env=env,
+                                   capture_output=True, text=True, check=True)
+                for name, seconds in json.loads(p.stdout.splitlines()[-1]).items():
+                    if mode == "lazy" or name not in ("import sdk.reke_sdk", "import app"):
+                        samples.setdefault(name, []).append(seconds)
+    results = []
+    for name, budget in COLD_BUDGETS_MS.items():
+        stats = summarize(samples[name])
+        results.append(dict(name=name, budget_ms=budget, over_budget=stats["p50_ms"] > budget, **stats))
+    return results
+
+def environment() -> dict:
+    import PIL
+    try:
+        commit = subprocess.run(["git", "-C", ROOT, "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "numpy": np.__version__, "pillow": PIL.__version__,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Reke SDK / API benchmarks")
+    ap.add_argument("suite", choices=("sdk", "api", "cold", "all"))
+    ap.add_argument("--out", help="write JSON results here (default: stdout)")
+    ap.add_argument("--quick", action="store_true", help=f"only sizes {', '.join(QUICK_SIZES)}")
+    ap.add_argument("--sizes", nargs="*", choices=tuple(SIZES), help="image sizes to run (default: all)")
+    ap.add_argument("--repeat", type=int, default=20, help="timed iterations per SDK case")
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--video-seconds", type=int, default=2)
+    ap.add_argument("--requests", type=int, default=200, help="requests per API case")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--cache", action="store_true", help="leave the API verification cache enabled")
+    ap.add_argument("--cold-runs", type=int, default=5, help="fresh interpreters per cold-start case")
+    args = ap.parse_args(argv)
+
+    report = {"environment": environment(), "args": vars(args), "results": []}
+    if args.suite in ("sdk", "all"):
+        report["results"] += [dict(r, suite="sdk") for r in bench_sdk(args)]
+    if args.suite in ("api", "all"):
+        report["results"] += [dict(r, suite="api") for r in bench_api(args)]
+    if args.suite in ("cold", "all"):
+        report["results"] += [dict(r, suite="cold") for r in bench_cold(args)]
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+        for r in report["results"]:
+            if "p50_ms" in r:
+                print(f"{r['suite']:4} {r['name']:<45} {r.get('size', ''):>6} {str(r.get('format', '')):>5} "
+                      f"p50={r['p50_ms']:.3f}ms p95={r['p95_ms']:.3f}ms"
+                      + (f" {r['throughput_rps']:.0f} req/s" if "throughput_rps" in r else ""))
+    else:
+        print(text)
+    over = [r for r in report["results"] if r.get("over_budget")]
+    for r in over:
+        print(f"over budget: {r['name']} p50={r['p50_ms']:.1f}ms > {r['budget_ms']}ms", file=sys.stderr)
+    return 1 if over else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
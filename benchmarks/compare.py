@@ -0,0 +1,28 @@
+# benchmarks/compare.py
+# Compare two bench.py JSON reports: python benchmarks/compare.py base.json new.json
+import sys, json
+
+KEY_FIELDS = ("suite", "name", "size", "format", "watermarked")
+
+def _index(report: dict) -> dict:
+    return {tuple(r.get(k) for k in KEY_FIELDS): r for r in report["results"] if "p50_ms" in r}
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    if len(argv) != 2:
+        print("usage: compare.py BASE.json NEW.json")
+        return 2
+    base, new = (json.load(open(p)) for p in argv)
+    b, n = _index(base), _index(new)
+    print(f"base {base['environment'].get('commit', '')[:10]}  new {new['environment'].get('commit', '')[:10]}")
+    print(f"{'case':<70} {'base p50':>10} {'new p50':>10} {'speedup':>8}")
+    for key in sorted(set(b) & set(n), key=lambda k: tuple(str(v) for v in k)):
+        label = " ".join(str(v) for v in key if v not in (None, ""))
+        old_ms, new_ms = b[key]["p50_ms"], n[key]["p50_ms"]
+        print(f"{label:<70} {old_ms:>9.3f}ms {new_ms:>9.3f}ms {old_ms / new_ms if new_ms else float('inf'):>7.2f}x")
+    for key in sorted(set(b) ^ set(n), key=lambda k: tuple(str(v) for v in k)):
+        print("only in", "base" if key in b else "new", " ".join(str(v) for v in key if v not in (None, "")))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,5 @@
 # fake_generator/app.py
-import os
+import os, sys, argparse
 from sdk.reke_sdk import embed_image_treering
 from PIL import Image, ImageDraw
 
@@ -12,9 +12,24 @@ def make_demo_base(path):
     d.text((30,30), "REKE Fake Generator sample", fill=(10,10,10))
     img.save(path)
 
-if __name__ == "__main__":
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Reke fake AI generator (demo)")
+    ap.add_argument("--phash-index", default="",
+                    help="register the sample in this perceptual index, e.g. the API's phash.db (default: none)")
+    sub = ap.add_subparsers(dest="command")
+    corpus_ap = sub.add_parser("corpus", help="generate a bulk synthetic corpus with a manifest of expected verdicts")
+    from corpus import add_arguments, generate_corpus
+    add_arguments(corpus_ap)
+    args = ap.parse_args(argv)
+    if args.command == "corpus":
+        return generate_corpus(args)
+
     base = os.path.join(OUT_DIR, "base.png")
     make_demo_base(base)
     out = os.path.join(OUT_DIR, "ai_sample.reke.png")
-    embed_image_treering(base, out, origin="FakeGenerator")
+    embed_image_treering(base, out, origin="FakeGenerator", phash_index=args.phash_index or None)
     print("Created", out)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+# fake_generator/corpus.py
+# Bulk synthetic corpus for load and regression tests of verification.
+# Items are generated in parallel, seeded per index (same seed -> same pixels
+# and plan; watermarked files differ only in the manifest timestamp),
+# streamed into a directory or a tar archive, and listed in manifest.jsonl
+# with the verdict the platform API is expected to return.
+import os, io, json, shutil, tarfile, tempfile, subprocess
+from multiprocessing import Pool
+import numpy as np
+from PIL import Image, ImageDraw
+from sdk.reke_sdk import embed_image, embed_video_hybrid, PNG_COMPRESSION, FFMPEG, FFPROBE
+
+FORMATS = {"png": ("PNG", ".png"), "jpeg": ("JPEG", ".jpg"), "webp": ("WEBP", ".webp")}
+
+def parse_size(text: str):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+def synthetic_image(size, seed: int) -> Image.Image:
+    """Seeded gradient + shapes + mild noise, so files compress like photos rather than flat fills."""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    c0, c1 = rng.integers(0, 256, 3), rng.integers(0, 256, 3)
+    t = np.linspace(0.0, 1.0, w, dtype=np.float32)[None, :, None]
+    arr = c0 * (1 - t) + c1 * t + rng.normal(0, 6, (h, w, 3))
+    img = Image.fromarray(np.clip(np.broadcast_to(arr, (h, w, 3)), 0, 255).astype(np.uint8), "RGB")
+    d = ImageDraw.Draw(img)
+    for _ in range(int(rng.integers(3, 12))):
+        x0, y0 = int(rng.integers(0, w)), int(rng.integers(0, h))
+        x1, y1 = x0 + int(rng.integers(4, max(5, w // 3))), y0 + int(rng.integers(4, max(5, h // 3)))
+        fill = tuple(int(v) for v in rng.integers(0, 256, 3))
+        (d.ellipse if rng.random() < 0.5 else d.rectangle)((x0, y0, x1, y1), fill=fill)
+    d.text((10, 10), f"REKE corpus #{seed}", fill=(10, 10, 10))
+    return img
+
+def plan_item(index: int, cfg: dict) -> dict:
+    """Deterministic choice of kind/size/format/watermark for item `index`."""
+    rng = np.random.default_rng([cfg["seed"], index])
+    if index >= cfg["count"]:
+        marked = bool(rng.random() < cfg["watermark_ratio"])
+        return {"index": index, "kind": "video", "watermarked": marked, "format": "mp4",
+                "seconds": cfg["video_seconds"], "size": cfg["video_size"]}
+    marked = bool(rng.random() < cfg["watermark_ratio"])
+    size = cfg["sizes"][int(rng.integers(len(cfg["sizes"])))]
+    # the SDK writes its watermark into PNG, so watermarked images are always PNG
+    fmt = "png" if marked else cfg["formats"][int(rng.integers(len(cfg["formats"])))]
+    return {"index": index, "kind": "image", "watermarked": marked, "format": fmt, "size": list(size)}
+
+def _make_image(item: dict, cfg: dict) -> bytes:
+    img = synthetic_image(tuple(item["size"]), cfg["seed"] * 1_000_003 + item["index"])
+    if item["watermarked"]:
+        # registering is opt-in: corpus items must not land in an index production lookups read
+        return embed_image(img, origin=cfg["origin"], compression=cfg["compression"],
+                           phash_index=cfg["phash_index"] or None)
+    pil_format, _ = FORMATS[item["format"]]
+    buf = io.BytesIO()
+    img.save(buf, pil_format, **({"quality": 90} if pil_format != "PNG" else {}))
+    return buf.getvalue()
+
+def _make_video(item: dict, cfg: dict, tmp: str) -> bytes:
+    w, h = item["size"]
+    clean = os.path.join(tmp, "clip.mp4")
+    # seeded start offset into ffmpeg's animated test pattern gives each clip different frames
+    src = f"testsrc2=size={w}x{h}:rate=15,trim=start={item['index'] % 50}"
+    subprocess.run([FFMPEG, "-v", "error", "-y", "-f", "lavfi", "-i", src, "-t", str(item["seconds"]),
+                    "-pix_fmt", "yuv420p", clean], check=True)
+    path = clean
+    if item["watermarked"]:
+        path = embed_video_hybrid(clean, os.path.join(tmp, "marked.mp4"), origin=cfg["origin"], workers=1)
+    with open(path, "rb") as f:
+        return f.read()
+
+def build_item(args):
+    """Worker: returns (manifest_record, file_bytes) for one corpus item."""
+    index, cfg = args
+    item = plan_item(index, cfg)
+    with tempfile.TemporaryDirectory(prefix="reke-corpus-") as tmp:
+        data = _make_video(item, cfg, tmp) if item["kind"] == "video" else _make_image(item, cfg)
+    ext = ".mp4" if item["kind"] == "video" else (".png" if item["watermarked"] else FORMATS[item["format"]][1])
+    prefix = "ai" if item["watermarked"] else "real"
+    item.update(name=f"{item['kind']}s/{prefix}_{index:07d}{ext}", bytes=len(data),
+                expected="AI Generated" if item["watermarked"] else "Real")
+    return item, data
+
+class _DirSink:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.manifest = open(os.path.join(path, "manifest.jsonl"), "w")
+
+    def add(self, item: dict, data: bytes):
+        dest = os.path.join(self.path, item["name"])
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        with open(dest, "wb") as f:
+            f.write(data)
+        self.manifest.write(json.dumps(item) + "\n")
+
+    def close(self):
+        self.manifest.close()
+
+class _TarSink:
+    """Streams members into a (optionally gzip'd) tar; manifest.jsonl is appended last."""
+    def __init__(self, path: str):
+        mode = "w:gz" if path.endswith((".tar.gz", ".tgz")) else "w"
+        self.tar = tarfile.open(path, mode)
+        self.manifest = tempfile.TemporaryFile("w+b")
+
+    def _add_bytes(self, name: str, data: bytes):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        self.tar.addfile(info, io.BytesIO(data))
+
+    def add(self, item: dict, data: bytes):
+        self._add_bytes(item["name"], data)
+        self.manifest.write((json.dumps(item) + "\n").encode())
+
+    def close(self):
+        self.manifest.seek(0)
+        self._add_bytes("manifest.jsonl", self.manifest.read())
+        self.manifest.close()
+        self.tar.close()
+
+def generate_corpus(args) -> int:
+    videos = args.videos
+    if videos and not (shutil.which(FFMPEG) and shutil.which(FFPROBE)):
+        print("ffmpeg/ffprobe not found: skipping videos")
+        videos = 0
+    cfg = {"count": args.count, "seed": args.seed, "watermark_ratio": args.watermark_ratio,
+           "sizes": [parse_size(s) for s in args.sizes], "formats": list(args.formats), "origin": args.origin,
+           "compression": args.compression, "phash_index": args.phash_index, "video_seconds": args.video_seconds, "video_size": list(parse_size(args.video_size))}
+    total = args.count + videos
+    sink = _TarSink(args.tar) if args.tar else _DirSink(args.out)
+    counts = {"AI Generated": 0, "Real": 0}
+    try:
+        with Pool(processes=args.workers or os.cpu_count() or 1) as pool:
+            # imap keeps output order == index order, so the manifest is reproducible
+            for done, (item, data) in enumerate(pool.imap(build_item, ((i, cfg) for i in range(total)),
+                                                           chunksize=args.chunksize), 1):
+                sink.add(item, data)
+                counts[item["expected"]] += 1
+                if done % 1000 == 0:
+                    print(f"{done}/{total}")
+    finally:
+        sink.close()
+    print(f"Created {total} items ({counts['AI Generated']} watermarked, {counts['Real']} clean) in",
+          args.tar or args.out)
+    return 0
+
+def add_arguments(ap):
+    ap.add_argument("--count", type=int, default=1000, help="number of images")
+    ap.add_argument("--videos", type=int, default=0, help="number of short video clips (needs ffmpeg/ffprobe)")
+    ap.add_argument("--sizes", nargs="+", default=["800x600"], help="image sizes, e.g. 640x480 1920x1080")
+    ap.add_argument("--formats", nargs="+", default=["png", "jpeg", "webp"], choices=tuple(FORMATS),
+                    help="formats for clean images (watermarked images are PNG)")
+    ap.add_argument("--watermark-ratio", type=float, default=0.5, help="fraction of items that are watermarked")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=0, help="worker processes (default: all cores)")
+    ap.add_argument("--chunksize", type=int, default=16)
+    ap.add_argument("--video-seconds", type=float, default=1.0)
+    ap.add_argument("--video-size", default="320x240")
+    ap.add_argument("--origin", default="FakeGenerator")
+    ap.add_argument("--compression", default="fast", choices=tuple(PNG_COMPRESSION),
+                    help="PNG encode preset for watermarked images")
+    ap.add_argument("--phash-index", default="",
+                    help="register watermarked images in this perceptual index (default: none; never the API's)")
+    ap.add_argument("--out", default=os.path.join("out", "corpus"), help="output directory")
+    ap.add_argument("--tar", help="write a .tar / .tar.gz archive instead of a directory")
@@ -1,89 +1,669 @@
 # platform_api/app.py
-import os, time, tempfile
-from fastapi import FastAPI, UploadFile, File
-from fastapi.responses import JSONResponse, FileResponse
+import os, json, time, shutil, logging, tempfile, asyncio, mimetypes, tarfile, zipfile, hashlib, mmap, threading, \
+    multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager, AsyncExitStack
+from functools import partial
+from typing import List
+import anyio
+from fastapi import FastAPI, UploadFile, File, Request
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sdk.reke_sdk import verify_image_treering, verify_video_hybrid, embed_image_treering
+from starlette.background import BackgroundTask
+from sdk.reke_sdk import verify_image_treering, verify_video_hybrid, verify_video_hybrid_async, embed_image_treering, \
+    PHASH_INDEX, FFMPEG, warm_up as warm_up_sdk
+from verify_cache import VerifyCache
+from ledger import VerificationLedger, BUCKETS
+from telemetry import STORE, STAGE_SECONDS, Counter, observe_verification, render_counter
+from samples_index import SampleIndex, THUMB_FORMATS
 
 BASE_DIR = os.path.dirname(__file__)
-SAMPLES_DIR = os.path.join(BASE_DIR, "samples")
+SAMPLES_DIR = os.getenv("REKE_SAMPLES_DIR", os.path.join(BASE_DIR, "samples"))
 os.makedirs(SAMPLES_DIR, exist_ok=True)
 
 PRICE_PER_VERIFICATION = float(os.getenv("REKE_PRICE", "0.001"))
+# server processes (gunicorn.conf.py); per-worker pools default to an even share of the cores
+WORKERS = max(1, int(os.getenv("REKE_WORKERS", "1")))
+BATCH_WORKERS = int(os.getenv("REKE_BATCH_WORKERS", str(max(1, (os.cpu_count() or 1) // WORKERS))))
+BATCH_MAX_ITEMS = int(os.getenv("REKE_BATCH_MAX_ITEMS", "1000"))
+# cap on a batch request body and, separately, on the bytes it expands to (archive members + files)
+BATCH_MAX_BYTES = int(float(os.getenv("REKE_BATCH_MAX_MB", "256")) * 1024 * 1024)
+# batch requests admitted at once (+ waiting) before 429, and items each one keeps in the pool's queue
+BATCH_CONCURRENCY = int(os.getenv("REKE_BATCH_CONCURRENCY", "2"))
+BATCH_QUEUE = int(os.getenv("REKE_BATCH_QUEUE", "2"))
+BATCH_WINDOW = int(os.getenv("REKE_BATCH_WINDOW", str(2 * max(1, BATCH_WORKERS))))
+# /verify/ runs image checks on this executor: "thread" (default) or "process"
+VERIFY_EXECUTOR = os.getenv("REKE_VERIFY_EXECUTOR", "thread").lower()
+VERIFY_WORKERS = int(os.getenv("REKE_VERIFY_WORKERS", str(min(32, (os.cpu_count() or 1) + 4))))
+# admission per media type: concurrent checks + waiting requests before 429
+IMAGE_CONCURRENCY = int(os.getenv("REKE_IMAGE_CONCURRENCY", "8"))
+IMAGE_QUEUE = int(os.getenv("REKE_IMAGE_QUEUE", "32"))
+VIDEO_CONCURRENCY = int(os.getenv("REKE_VIDEO_CONCURRENCY", "2"))
+VIDEO_QUEUE = int(os.getenv("REKE_VIDEO_QUEUE", "4"))
+RETRY_AFTER = int(os.getenv("REKE_RETRY_AFTER", "1"))
+# uploads: hard size cap (enforced while the body is received) and hashing chunk size
+MAX_UPLOAD_BYTES = int(float(os.getenv("REKE_MAX_UPLOAD_MB", "512")) * 1024 * 1024)
+UPLOAD_CHUNK = 1024 * 1024
+# images: also recompute the tiled content hash (full decode) instead of trusting the manifest
+STRICT_VERIFY = os.getenv("REKE_STRICT_VERIFY", "0").lower() in ("1", "true", "yes")
+# images without a valid manifest: run the frequency ring detector (catches re-encoded/resized marks)
+RING_DETECT = os.getenv("REKE_RING_DETECT", "0").lower() in ("1", "true", "yes")
+# videos without a valid manifest: sample frames through the ring detector, bounded per upload
+VIDEO_FRAMES = os.getenv("REKE_VIDEO_FRAMES", "0").lower() in ("1", "true", "yes")
+FRAME_OPTIONS = {
+    'stride': int(os.getenv("REKE_FRAME_STRIDE", "15")),
+    'max_frames': int(os.getenv("REKE_FRAME_MAX", "24")),
+    'max_seconds': float(os.getenv("REKE_FRAME_SECONDS", "5")),
+    'keyframes': os.getenv("REKE_FRAME_KEYFRAMES", "0").lower() in ("1", "true", "yes"),
+}
+# images without a valid manifest are also looked up in the perceptual-hash index of embeds
+# (REKE_PHASH_INDEX, shared with the generator; REKE_PHASH_DISTANCE bits) -- read by the SDK
+# verification result cache keyed by content SHA-256 (REKE_CACHE_DB enables the on-disk tier)
+CACHE_SIZE = int(os.getenv("REKE_CACHE_SIZE", "10000"))
+CACHE_TTL = float(os.getenv("REKE_CACHE_TTL", "3600"))
+CACHE_DB = os.getenv("REKE_CACHE_DB", "")
+# append-only verification ledger (SQLite WAL); mount a volume here to keep it across restarts
+LEDGER_DB = os.getenv("REKE_LEDGER_DB", os.path.join(BASE_DIR, "data", "ledger.db"))
+# log the per-stage breakdown of verifications slower than this (0 disables)
+SLOW_SECONDS = float(os.getenv("REKE_SLOW_MS", "0")) / 1000.0
+# sample serving: browser cache lifetime and where generated thumbnails are kept
+SAMPLE_MAX_AGE = int(os.getenv("REKE_SAMPLE_MAX_AGE", "300"))
+THUMB_DIR = os.getenv("REKE_THUMB_DIR", "")
+# prime codecs and SDK caches at startup (in the background; /healthz reports 503 until done)
+WARM_UP = os.getenv("REKE_WARM_UP", "1").lower() in ("1", "true", "yes")
 
 app = FastAPI(title="Reke Platform API (Demo)")
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
 
-METRICS = {'total': 0, 'verified': 0, 'unverified': 0, 'last_10': []}
+# counters live in shared memory, so every worker reports the same totals
+METRICS = {name: Counter(f"verifications_{name}") for name in ('total', 'verified', 'unverified')}
+VERIFY_CACHE = VerifyCache(CACHE_SIZE, CACHE_TTL, CACHE_DB,
+                           variant="+".join(v for v, on in (("strict", STRICT_VERIFY), ("ring", RING_DETECT),
+                                                            ("frames", VIDEO_FRAMES),
+                                                            ("phash", bool(PHASH_INDEX))) if on))
+SAMPLES = SampleIndex(SAMPLES_DIR, THUMB_DIR or None)
+# rows the ledger lost (queue full or SQLite error), summed over workers
+LEDGER_DROPPED = Counter("ledger_dropped")
+LEDGER = VerificationLedger(LEDGER_DB, on_drop=LEDGER_DROPPED.inc)
 
-@app.get("/", response_class=FileResponse)
+_batch_pool = None
+_verify_executor = None
+
+def _drop_executors():
+    # pools are per process: a forked worker starts its own on first use
+    global _batch_pool, _verify_executor
+    _batch_pool = _verify_executor = None
+
+os.register_at_fork(after_in_child=_drop_executors)
+
+STARTED = time.time()
+READY = threading.Event()
+_warm_up_seconds = None
+
+def warm_up():
+    """
+    Prime the SDK (PNG/JPEG codecs, keys, perceptual index) so the first
+    request does not pay for it. gunicorn.conf.py runs this in the master
+    before workers fork; a single process runs it in the background at startup.
+    """
+    global _warm_up_seconds
+    if not READY.is_set():
+        t0 = time.perf_counter()
+        warm_up_sdk(PHASH_INDEX)
+        anyio.run(anyio.sleep, 0)  # starlette's asyncio backend is otherwise imported by the first request
+        _warm_up_seconds = time.perf_counter() - t0
+        READY.set()
+
+@app.on_event("startup")
+def _start_warm_up():
+    if VIDEO_FRAMES and not shutil.which(FFMPEG):
+        # each upload would quietly keep its metadata verdict; say so once, up front
+        logging.getLogger("reke").warning("REKE_VIDEO_FRAMES=1 but %r is not on PATH: stripped videos will not be "
+                                          "frame-sampled (install ffmpeg or set REKE_FFMPEG)", FFMPEG)
+    if not WARM_UP:
+        READY.set()  # everything loads on first use instead
+    elif not READY.is_set():
+        threading.Thread(target=warm_up, name="reke-warm-up", daemon=True).start()
+
+def _pool_context():
+    """
+    Process pools start from a forkserver with this module preloaded, not as
+    forks of the serving process: its threads may hold locks (perceptual
+    index, logging, PIL) at fork time, and a child would keep them forever.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    if ctx.get_start_method() == "forkserver":
+        ctx.set_forkserver_preload([__name__])
+    return ctx
+
+def get_batch_pool() -> ProcessPoolExecutor:
+    """Process pool shared by batch requests (created on first use)."""
+    global _batch_pool
+    if _batch_pool is None:
+        _batch_pool = ProcessPoolExecutor(max_workers=max(1, BATCH_WORKERS), mp_context=_pool_context())
+    return _batch_pool
+
+def get_verify_executor():
+    """Executor that keeps PIL decoding off the event loop for /verify/."""
+    global _verify_executor
+    if _verify_executor is None:
+        if VERIFY_EXECUTOR == "process":
+            _verify_executor = ProcessPoolExecutor(max_workers=max(1, VERIFY_WORKERS), mp_context=_pool_context())
+        else:
+            _verify_executor = ThreadPoolExecutor(max_workers=max(1, VERIFY_WORKERS), thread_name_prefix="reke-verify")
+    return _verify_executor
+
+@app.on_event("shutdown")
+def _shutdown_executors():
+    for pool in (_batch_pool, _verify_executor):
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+    LEDGER.close()  # writes whatever is still queued
+
+class Overloaded(Exception):
+    pass
+
+class AdmissionGate:
+    """Concurrency limit for one media type, with a bounded number of waiters."""
+    def __init__(self, limit: int, queue: int):
+        self.limit, self.queue = max(1, limit), max(0, queue)
+        self.sem = asyncio.Semaphore(self.limit)
+        self.pending = 0
+
+    @asynccontextmanager
+    async def admit(self):
+        if self.pending >= self.limit + self.queue:
+            raise Overloaded()
+        self.pending += 1
+        try:
+            async with self.sem:
+                yield
+        finally:
+            self.pending -= 1
+
+GATES = {
+    'image': AdmissionGate(IMAGE_CONCURRENCY, IMAGE_QUEUE),
+    'video': AdmissionGate(VIDEO_CONCURRENCY, VIDEO_QUEUE),
+    'batch': AdmissionGate(BATCH_CONCURRENCY, BATCH_QUEUE),
+}
+
+def media_kind(mime: str) -> str:
+    return 'video' if mime.startswith('video') else 'image'
+
+class UploadTooLarge(Exception):
+    pass
+
+class UploadSpool:
+    """
+    The upload as Starlette already spooled it (in memory up to 1 MB, then an
+    unnamed temp file): size and SHA-256 are computed in one pass over that
+    file, and buffer() hands the same bytes to the SDK without another copy:
+    the single chunk read by that pass, or an mmap of the file.
+    """
+    def __init__(self, f, max_bytes: int):
+        self._f, self._map, self._path = f, None, None
+        self.size, digest, first = 0, hashlib.sha256(), b""
+        f.seek(0)
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK), b""):
+            first = first or chunk
+            self.size += len(chunk)
+            if self.size > max_bytes:
+                raise UploadTooLarge(f"upload exceeds {max_bytes} bytes")
+            digest.update(chunk)
+        self.sha256 = digest.hexdigest()
+        self._data = first if len(first) == self.size else None  # small uploads: already in hand
+
+    def file(self):
+        """The spooled file, rewound (e.g. for zipfile/tarfile)."""
+        self._f.seek(0)
+        return self._f
+
+    def buffer(self):
+        """Zero-copy view: the bytes read while hashing, or an mmap of the spooled file."""
+        if self._data is not None:
+            return self._data
+        if self._map is None:
+            self._map = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)  # fileno() rolls a spool to disk
+        return self._map
+
+    def path(self) -> str:
+        """Named copy on disk, for consumers in other processes (made once, removed on close)."""
+        if self._path is None:
+            with tempfile.NamedTemporaryFile(delete=False) as tmp:
+                tmp.write(self.buffer())
+            self._path = tmp.name
+        return self._path
+
+    def portable(self):
+        """Picklable form for process executors: bytes when small, else a path."""
+        return self._data if self._data is not None else self.path()
+
+    def close(self):
+        if self._map is not None:
+            try: self._map.close()
+            except BufferError: pass  # a view is still alive; the mapping goes with it
+            self._map = None
+        if self._path is not None:
+            try: os.unlink(self._path)
+            except OSError: pass
+            self._path = None
+
+async def read_upload(file: UploadFile) -> UploadSpool:
+    """Size and hash `file` in place (off the event loop unless small), enforcing MAX_UPLOAD_BYTES."""
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise UploadTooLarge(f"upload exceeds {MAX_UPLOAD_BYTES} bytes")
+    if file.size is not None and file.size <= UPLOAD_CHUNK:
+        return UploadSpool(file.file, MAX_UPLOAD_BYTES)
+    return await asyncio.to_thread(UploadSpool, file.file, MAX_UPLOAD_BYTES)
+
+def verify_content(content, mime: str):
+    """
+    Run the SDK check matching `mime` (usually on a worker).
+    Returns ((status, manifest, sig_ok), stage_timings); 'verify' is the whole SDK call.
+    """
+    timings = {}
+    t0 = time.perf_counter()
+    if mime.startswith('video'):
+        result = verify_video_hybrid(content, timings=timings, frames=VIDEO_FRAMES, **FRAME_OPTIONS)
+    else:
+        result = verify_image_treering(content, timings=timings, strict=STRICT_VERIFY, rings=RING_DETECT)
+    timings['verify'] = time.perf_counter() - t0
+    return result, timings
+
+async def verify_content_async(spool: UploadSpool, mime: str, timings: dict):
+    """verify_content for the event loop: images on the verify executor, ffprobe as an asyncio subprocess."""
+    if mime.startswith('video'):
+        t0 = time.perf_counter()
+        # comments are read from the buffer in-process; ffprobe and frame sampling share one temp file, written off the loop
+        result = await verify_video_hybrid_async(spool.buffer(), timings=timings, frames=VIDEO_FRAMES,
+                                                 **FRAME_OPTIONS)
+        timings['verify'] = time.perf_counter() - t0
+        return result
+    loop = asyncio.get_running_loop()
+    executor = get_verify_executor()
+    source = spool.portable() if isinstance(executor, ProcessPoolExecutor) else spool.buffer()
+    result, stage_timings = await loop.run_in_executor(executor, verify_content, source, mime)
+    timings.update(stage_timings)
+    return result
+
+def record_verification(filename: str, mime: str, status: str, sig_ok: bool, sha256: str = None, cached: bool = False):
+    LEDGER.record(filename, mime, media_kind(mime), status, sig_ok, sha256, cached, PRICE_PER_VERIFICATION)
+    METRICS['total'].inc()
+    METRICS['verified' if status == "AI Generated" else 'unverified'].inc()
+
+class BodyLimit:
+    """
+    ASGI middleware capping POST bodies per path: refused at once when the
+    declared Content-Length is over the limit, otherwise (chunked uploads)
+    as soon as the bytes received pass it, before the form is fully spooled.
+    """
+    def __init__(self, app, limits: dict):
+        self.app, self.limits = app, limits
+
+    @staticmethod
+    async def _reject(send, limit: int):
+        body = json.dumps({'status': 'Unknown', 'error': f'request body exceeds {limit} bytes'}).encode()
+        await send({'type': 'http.response.start', 'status': 413,
+                    'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()),
+                                (b'connection', b'close')]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope['path']) if scope['type'] == 'http' and scope['method'] == 'POST' else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+        declared = dict(scope['headers']).get(b'content-length', b'')
+        if declared.isdigit() and int(declared) > limit:
+            return await self._reject(send, limit)
+        received, over, started = 0, False, False
+
+        async def limited_receive():
+            nonlocal received, over
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > limit:
+                    over = True
+                    return {'type': 'http.disconnect'}  # the form parser stops reading here
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if not over:
+                started = True
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not over:
+                raise
+        if over and not started:
+            await self._reject(send, limit)
+
+MULTIPART_SLACK = 64 * 1024  # allowance for multipart framing
+app.add_middleware(BodyLimit, limits={'/verify/': MAX_UPLOAD_BYTES + MULTIPART_SLACK,
+                                     '/verify/batch': BATCH_MAX_BYTES + MULTIPART_SLACK})
+
+# simple instructions page, served as a text file for convenience
+HOME_TEXT = ("Reke Platform API (Demo)\n\n"
+             "POST files to /verify/ to check.\n"
+             "POST many files (or a zip/tar) to /verify/batch; add ?stream=true for NDJSON.\n"
+             "GET /metrics (JSON) or /metrics/prometheus for counters and stage latencies.\n"
+             "GET /ledger/history (paginated) and /ledger/aggregate?bucket=hour for the verification ledger.\n"
+             "GET /samples to see available demo files.\n"
+             "GET /sample/{filename} to download a sample (ETag / If-None-Match supported).\n"
+             "GET /sample/{filename}/thumb?w=320 for a cached WebP/JPEG preview.\n"
+             "GET /healthz for readiness (503 while warming up).\n")
+
+@app.get("/", response_class=PlainTextResponse)
 def home():
-    # simple instructions page returned as text file for convenience
-    content = ("Reke Platform API (Demo)\n\n"
-               "POST files to /verify/ to check.\n"
-               "GET /samples to see available demo files.\n"
-               "GET /sample/{filename} to download a sample.\n")
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".txt")
-    tmp.write(content.encode()); tmp.close()
-    return FileResponse(tmp.name, media_type="text/plain", filename="README.txt")
+    return PlainTextResponse(HOME_TEXT, headers={'Content-Disposition': 'attachment; filename="README.txt"'})
+
+@app.get("/healthz")
+def healthz():
+    ready = READY.is_set()
+    body = {'status': 'ok' if ready else 'warming', 'ready': ready, 'uptime': round(time.time() - STARTED, 3),
+            'warm_up_ms': None if _warm_up_seconds is None else round(_warm_up_seconds * 1000, 1)}
+    return JSONResponse(body, status_code=200 if ready else 503)
 
 @app.post("/verify/")
 async def verify_file(file: UploadFile = File(...)):
-    content = await file.read()
     mime = (file.content_type or "").lower()
+    kind = media_kind(mime)
 
+    spool = None
+    timings = {}
+    started = time.perf_counter()
     try:
-        if mime.startswith('video'):
-            tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-            tmp.write(content); tmp.close()
-            status, manifest, sig_ok = verify_video_hybrid(tmp.name)
-            try: os.unlink(tmp.name)
-            except: pass
-        else:
-            status, manifest, sig_ok = verify_image_treering(content)
+        async with GATES[kind].admit():
+            t0 = time.perf_counter()
+            spool = await read_upload(file)
+            timings['upload_read'] = time.perf_counter() - t0
+            result = VERIFY_CACHE.get(kind, spool.sha256)
+            cached = result is not None
+            if not cached:
+                result = await verify_content_async(spool, mime, timings)
+                VERIFY_CACHE.put(kind, spool.sha256, result)
+            status, manifest, sig_ok = result
+    except Overloaded:
+        return JSONResponse({'status': 'Unknown', 'error': f'too many {kind} verifications in flight'},
+                            status_code=429, headers={'Retry-After': str(RETRY_AFTER)})
+    except UploadTooLarge as e:
+        return JSONResponse({'status': 'Unknown', 'error': str(e)}, status_code=413)
     except Exception as e:
+        timings['total'] = time.perf_counter() - started
+        observe_verification(kind, 'error', timings, SLOW_SECONDS, filename=file.filename)
         return JSONResponse({'status': 'Unknown', 'error': str(e)}, status_code=500)
+    finally:
+        if spool is not None:
+            spool.close()
 
-    METRICS['total'] += 1
-    if status == "AI Generated":
-        METRICS['verified'] += 1
-    else:
-        METRICS['unverified'] += 1
-
-    rec = {
-        'filename': getattr(file, 'filename', 'uploaded'),
-        'mime': mime,
-        'status': status,
-        'sig_valid': bool(sig_ok),
-        'timestamp': time.time()
-    }
-    METRICS['last_10'].append(rec)
-    METRICS['last_10'] = METRICS['last_10'][-10:]
+    record_verification(getattr(file, 'filename', 'uploaded'), mime, status, sig_ok, spool.sha256, cached)
+    timings['total'] = time.perf_counter() - started
+    observe_verification(kind, status, timings, SLOW_SECONDS, filename=file.filename, sha256=spool.sha256, cached=cached)
 
     return JSONResponse({
         'status': status,
         'signature_valid': bool(sig_ok),
         'price': PRICE_PER_VERIFICATION,
-        'manifest': manifest
+        'manifest': manifest,
+        'sha256': spool.sha256,
+        'cached': cached
     })
 
+# ----- Batch verification -----
+ARCHIVE_MIMES = ('application/zip', 'application/x-zip-compressed', 'application/x-tar', 'application/gzip',
+                 'application/x-gzip', 'application/x-compressed-tar')
+
+def _guess_mime(name: str) -> str:
+    return (mimetypes.guess_type(name)[0] or 'application/octet-stream').lower()
+
+def _is_archive(name: str, mime: str) -> bool:
+    lname = name.lower()
+    return mime in ARCHIVE_MIMES or lname.endswith(('.zip', '.tar', '.tar.gz', '.tgz'))
+
+def _archive_members(f):
+    """(name, declared size, open) for every regular file in a zip or tar archive; nothing is extracted yet."""
+    if zipfile.is_zipfile(f):
+        with zipfile.ZipFile(f) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    yield info.filename, info.file_size, partial(zf.open, info)  # reads stop at file_size
+        return
+    f.seek(0)
+    with tarfile.open(fileobj=f, mode="r:*") as tf:
+        for member in tf:
+            if member.isfile():
+                yield member.name, member.size, partial(tf.extractfile, member)
+
+def _collect_batch(files, workdir: str) -> list:
+    """
+    (name, mime, path, sha256) per item (runs on a worker thread). Files and
+    archive members are copied into `workdir` a chunk at a time, so pool
+    workers get a path instead of the payload. Each item is checked against
+    MAX_UPLOAD_BYTES and all of them together against BATCH_MAX_BYTES, both
+    on the declared size and on the bytes actually copied, so archives cannot
+    expand past it.
+    """
+    items, total = [], 0
+
+    def check(name: str, size: int, expanded: int):
+        if size > MAX_UPLOAD_BYTES:
+            raise UploadTooLarge(f"{name} exceeds {MAX_UPLOAD_BYTES} bytes")
+        if expanded > BATCH_MAX_BYTES:
+            raise UploadTooLarge(f"batch expands past {BATCH_MAX_BYTES} bytes")
+
+    def spill(name: str, mime: str, src, declared: int = 0):
+        nonlocal total
+        if len(items) >= BATCH_MAX_ITEMS:
+            raise ValueError(f"batch exceeds {BATCH_MAX_ITEMS} items")
+        check(name, declared, total + declared)
+        path, size, digest = os.path.join(workdir, str(len(items))), 0, hashlib.sha256()
+        with open(path, "wb") as out:
+            for chunk in iter(lambda: src.read(UPLOAD_CHUNK), b""):
+                size += len(chunk)
+                total += len(chunk)
+                check(name, size, total)
+                digest.update(chunk)
+                out.write(chunk)
+        items.append((name, mime, path, digest.hexdigest()))
+
+    for f in files:
+        name = f.filename or 'uploaded'
+        mime = (f.content_type or "").lower()
+        f.file.seek(0)
+        if not _is_archive(name, mime):
+            spill(name, mime or _guess_mime(name), f.file)
+            continue
+        # the archive itself is bounded by the body limit; only what it expands to is charged
+        for member, size, open_member in _archive_members(f.file):
+            with open_member() as src:
+                spill(member, _guess_mime(member), src, size)
+    return items
+
+def _batch_result(index: int, name: str, mime: str, digest: str, fut) -> dict:
+    try:
+        (status, manifest, sig_ok), timings = fut.result()
+    except Exception as e:
+        return {'index': index, 'filename': name, 'status': 'Unknown', 'signature_valid': False,
+                'manifest': None, 'error': str(e)}
+    record_verification(name, mime, status, sig_ok, digest, cached=not timings)
+    if timings:
+        timings['total'] = timings.get('verify', 0.0)
+        observe_verification(media_kind(mime), status, timings, SLOW_SECONDS, filename=name)
+    return {'index': index, 'filename': name, 'status': status, 'signature_valid': bool(sig_ok),
+            'manifest': manifest}
+
+async def _verify_batch_item(window: asyncio.Semaphore, path: str, mime: str, digest: str):
+    """Cached result, or verify_content on the batch pool once one of the request's window slots is free."""
+    kind = media_kind(mime)
+    hit = VERIFY_CACHE.get(kind, digest)
+    if hit is not None:
+        return hit, {}
+    async with window:
+        result = await asyncio.get_running_loop().run_in_executor(get_batch_pool(), verify_content, path, mime)
+    VERIFY_CACHE.put(kind, digest, result[0])
+    return result
+
+@app.post("/verify/batch")
+async def verify_batch(files: List[UploadFile] = File(...), stream: bool = False):
+    """
+    Verify many files in one request: several multipart `files` fields and/or
+    zip/tar archives. Items run on a process pool; results come back in input
+    order, or as NDJSON lines in completion order when `stream=true`.
+    At most BATCH_CONCURRENCY batches run per worker (429 past the queue), and
+    each keeps at most BATCH_WINDOW items in the pool at a time.
+    """
+    # the gate, the spilled items and unfinished tasks are released once the response is done
+    resources = AsyncExitStack()
+    try:
+        await resources.enter_async_context(GATES['batch'].admit())
+    except Overloaded:
+        return JSONResponse({'error': 'too many batch verifications in flight'}, status_code=429,
+                            headers={'Retry-After': str(RETRY_AFTER)})
+    release = resources.aclose
+    try:
+        workdir = tempfile.mkdtemp(prefix="reke-batch-")
+        resources.callback(shutil.rmtree, workdir, ignore_errors=True)
+        try:
+            items = await asyncio.to_thread(_collect_batch, files, workdir)
+        except UploadTooLarge as e:
+            return JSONResponse({'error': str(e)}, status_code=413)
+        except Exception as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
+
+        window = asyncio.Semaphore(max(1, BATCH_WINDOW))
+        meta = [(name, mime, digest) for name, mime, _, digest in items]
+        futures = [asyncio.ensure_future(_verify_batch_item(window, path, mime, digest))
+                   for _, mime, path, digest in items]
+
+        def cancel_pending():  # e.g. a stream the client dropped
+            for fut in futures:
+                fut.cancel()
+        resources.callback(cancel_pending)
+
+        if stream:
+            async def ndjson(release):
+                try:
+                    pending = {fut: i for i, fut in enumerate(futures)}
+                    while pending:
+                        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        for fut in done:
+                            i = pending.pop(fut)
+                            yield json.dumps(_batch_result(i, *meta[i], fut)) + "\n"
+                finally:
+                    await release()
+            # released by the stream when it ends, or after the response if it never started
+            response = StreamingResponse(ndjson(release), media_type="application/x-ndjson",
+                                         background=BackgroundTask(release))
+            release = None
+            return response
+
+        if futures:
+            await asyncio.wait(futures)
+        results = [_batch_result(i, *m, fut) for i, (m, fut) in enumerate(zip(meta, futures))]
+        return JSONResponse({
+            'count': len(results),
+            'failed': sum(1 for r in results if 'error' in r),
+            'price': PRICE_PER_VERIFICATION,
+            'results': results
+        })
+    finally:
+        if release is not None:
+            await release()
+
 @app.get("/metrics")
 def metrics():
-    revenue = METRICS['total'] * PRICE_PER_VERIFICATION
-    return {'metrics': METRICS, 'price_per_verification': PRICE_PER_VERIFICATION, 'estimated_revenue_this_session': revenue}
+    counts = {name: counter.value for name, counter in METRICS.items()}
+    # recent rows come from the ledger so they cover every worker (written within ~0.5 s)
+    last_10 = [{'filename': r['filename'], 'mime': r['mime'], 'status': r['status'], 'sig_valid': r['sig_valid'],
+                'timestamp': r['ts']} for r in LEDGER.history(10)['items']]
+    ledger = LEDGER.totals()
+    return {'metrics': dict(counts, last_10=last_10), 'workers': STORE.workers(),
+            'price_per_verification': PRICE_PER_VERIFICATION,
+            'estimated_revenue_this_session': counts['total'] * PRICE_PER_VERIFICATION, 'all_time': ledger,
+            'estimated_revenue_all_time': ledger['revenue'], 'cache': VERIFY_CACHE.stats(),
+            'ledger': dict(LEDGER.stats(), dropped_all_workers=LEDGER_DROPPED.value)}
+
+# ----- Ledger queries -----
+@app.get("/ledger/history")
+def ledger_history(limit: int = 50, cursor: int = None, status: str = None, sha256: str = None,
+                   since: float = None, until: float = None):
+    """Recorded verifications, newest first; pass `next_cursor` back as `cursor` for the next page."""
+    return LEDGER.history(limit, cursor, status, sha256, since, until)
+
+@app.get("/ledger/aggregate")
+def ledger_aggregate(bucket: str = 'hour', since: float = None, until: float = None, status: str = None,
+                     media: str = None):
+    """Counts, valid signatures and revenue per minute/hour/day bucket (unix-second bucket starts)."""
+    if bucket not in BUCKETS:
+        return JSONResponse({'error': f"bucket must be one of {', '.join(BUCKETS)}"}, status_code=400)
+    return {'bucket': bucket, 'series': LEDGER.aggregate(bucket, since, until, status, media)}
+
+@app.get("/metrics/prometheus", response_class=PlainTextResponse)
+def metrics_prometheus():
+    """Counters and per-stage latency histograms in the Prometheus text format."""
+    cache = VERIFY_CACHE.stats()
+    lines = []
+    lines += render_counter("reke_verifications_total", "Verifications served.", METRICS['total'].value)
+    lines += render_counter("reke_verified_total", "Verifications that found a valid watermark.", METRICS['verified'].value)
+    lines += render_counter("reke_unverified_total", "Verifications without a valid watermark.", METRICS['unverified'].value)
+    lines += render_counter("reke_cache_hits_total", "Verification cache hits.", cache['hits'])
+    lines += render_counter("reke_cache_misses_total", "Verification cache misses.", cache['misses'])
+    lines += render_counter("reke_cache_entries", "Entries in this worker's in-memory verification cache.", cache['entries'], "gauge")
+    lines += render_counter("reke_ledger_dropped_total", "Verifications the ledger failed to record.",
+                            LEDGER_DROPPED.value)
+    lines += render_counter("reke_workers", "Live server processes sharing these metrics.", STORE.workers(), "gauge")
+    lines += STAGE_SECONDS.render()
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
 
 @app.get("/samples")
 def list_samples():
-    files = sorted(f for f in os.listdir(SAMPLES_DIR) if os.path.isfile(os.path.join(SAMPLES_DIR, f)))
-    return {"samples": files}
+    return {"samples": SAMPLES.names()}
+
+def _cached_file(request: Request, entry, path: str, media_type: str, **extra_headers):
+    """FileResponse with a strong ETag / Last-Modified, or 304 when the client copy is current."""
+    headers = {'ETag': entry.etag, 'Last-Modified': entry.last_modified,
+               'Cache-Control': f'public, max-age={SAMPLE_MAX_AGE}', **extra_headers}
+    if entry.not_modified(request.headers.get('if-none-match'), request.headers.get('if-modified-since')):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=media_type, headers=headers)
 
 @app.get("/sample/{filename}")
-def sample_file(filename: str):
-    path = os.path.join(SAMPLES_DIR, filename)
-    if not os.path.exists(path):
+def sample_file(filename: str, request: Request):
+    entry = SAMPLES.get(filename)
+    if entry is None:
+        return JSONResponse({'error': 'not found'}, status_code=404)
+    return _cached_file(request, entry, entry.path, entry.mime,
+                        **{'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@app.get("/sample/{filename}/thumb")
+def sample_thumb(filename: str, request: Request, w: int = 320, fmt: str = ""):
+    """
+    Resized preview of a sample (width clamped to 32..1024, rounded to 32px).
+    WebP when the client accepts it, else JPEG; built once and cached on disk.
+    """
+    entry = SAMPLES.get(filename)
+    if entry is None:
         return JSONResponse({'error': 'not found'}, status_code=404)
-    mime = "image/png" if filename.lower().endswith(".png") else "image/jpeg"
-    return FileResponse(path, media_type=mime, filename=filename)
+    fmt = fmt.lower() or ("webp" if "image/webp" in request.headers.get('accept', '') else "jpeg")
+    if fmt not in THUMB_FORMATS:
+        return JSONResponse({'error': f'fmt must be one of {sorted(THUMB_FORMATS)}'}, status_code=400)
+    width = SAMPLES.thumb_width(w)
+    # same source + same variant -> same bytes, so derive the ETag from the source's
+    etag = entry.etag[:-1] + f'-{width}{fmt}"'
+    headers = {'ETag': etag, 'Last-Modified': entry.last_modified,
+               'Cache-Control': f'public, max-age={SAMPLE_MAX_AGE}', 'Vary': 'Accept'}
+    inm = request.headers.get('if-none-match')
+    if inm and ('*' in inm or etag in [t.strip() for t in inm.split(',')]):
+        return Response(status_code=304, headers=headers)
+    try:
+        path = SAMPLES.thumbnail(entry, width, fmt)
+    except Exception as e:
+        return JSONResponse({'error': f'cannot build thumbnail: {e}'}, status_code=415)
+    return FileResponse(path, media_type=THUMB_FORMATS[fmt][1], headers=headers)
 
 @app.post("/sample/generate_ai")
 def generate_ai():
@@ -0,0 +1,33 @@
+# platform_api/gunicorn.conf.py
+# Pre-fork deployment: gunicorn -c gunicorn.conf.py app:app
+# The app is imported once in the master (SDK, shared metrics segment),
+# warmed up (REKE_WARM_UP), then forked into REKE_WORKERS uvicorn workers that
+# share its memory copy-on-write and update the same counters.
+import os
+
+def _cpus() -> int:
+    """CPUs this container may use: the affinity mask, capped by a cgroup v2 quota (docker --cpus)."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# each worker holds a full app + decoder buffers, so the default stays low; set REKE_WORKERS to go higher
+workers = max(1, int(os.getenv("REKE_WORKERS", str(min(4, _cpus())))))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("REKE_WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+# app.py sizes per-worker pools from REKE_WORKERS
+os.environ.setdefault("REKE_WORKERS", str(workers))
+
+def on_starting(server):
+    import app  # already imported by preload_app
+    if app.WARM_UP:
+        app.warm_up()  # workers fork ready (/healthz 200)
@@ -0,0 +1,185 @@
+# platform_api/ledger.py
+# Append-only verification ledger (SQLite, WAL).
+# Requests only enqueue a row; a background thread writes queued rows in
+# batches, one transaction each, and keeps per-minute/hour/day rollups
+# up to date in the same transaction, so aggregate queries read a few rollup
+# rows instead of scanning the ledger.
+# Fork-safe: the writer thread and connections are opened per process on
+# first use, so a preloaded app gets one writer per worker (SQLite serialises
+# their transactions; WAL keeps readers unblocked).
+import os, time, queue, logging, sqlite3, threading
+
+BUCKETS = {'minute': 60, 'hour': 3600, 'day': 86400}
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS verifications ("
+    " id INTEGER PRIMARY KEY, ts REAL NOT NULL, filename TEXT, mime TEXT, media TEXT NOT NULL,"
+    " status TEXT NOT NULL, sig_valid INTEGER NOT NULL, sha256 TEXT, cached INTEGER NOT NULL, price REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS verifications_ts ON verifications (ts)",
+    "CREATE INDEX IF NOT EXISTS verifications_status ON verifications (status)",
+    "CREATE INDEX IF NOT EXISTS verifications_sha256 ON verifications (sha256)",
+    "CREATE TABLE IF NOT EXISTS verification_rollup ("
+    " width INTEGER NOT NULL, bucket INTEGER NOT NULL, media TEXT NOT NULL, status TEXT NOT NULL,"
+    " count INTEGER NOT NULL, sig_valid INTEGER NOT NULL, revenue REAL NOT NULL,"
+    " PRIMARY KEY (width, bucket, media, status)) WITHOUT ROWID",
+)
+log = logging.getLogger("reke.ledger")
+
+COLUMNS = ('id', 'ts', 'filename', 'mime', 'media', 'status', 'sig_valid', 'sha256', 'cached', 'price')
+
+class VerificationLedger:
+    def __init__(self, path: str, batch_size: int = 1000, flush_interval: float = 0.5, max_queue: int = 100000,
+                 busy_timeout: float = 30.0, on_drop=None):
+        """`on_drop(n)` is called with every batch of rows lost (queue full or write failed), e.g. a shared counter."""
+        self.path, self.batch_size, self.flush_interval = path, batch_size, flush_interval
+        self.max_queue, self.busy_timeout, self.on_drop = max_queue, busy_timeout, on_drop
+        db = self._connect()
+        with db:
+            for stmt in SCHEMA:
+                db.execute(stmt)
+        db.close()
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self.written = self.dropped = 0
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._local = threading.local()
+        self._start_lock = threading.Lock()
+        self._writer = None
+
+    def _ensure_writer(self):
+        if self._writer is None:
+            with self._start_lock:
+                if self._writer is None:
+                    writer = threading.Thread(target=self._run, name="reke-ledger", daemon=True)
+                    writer.start()
+                    self._writer = writer
+
+    def _connect(self) -> sqlite3.Connection:
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # workers share one file: wait for another writer's transaction instead of failing with "locked"
+        db = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _reader(self) -> sqlite3.Connection:
+        """One read connection per thread; WAL readers never block the writer."""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = self._connect()
+        return db
+
+    # ----- writes -----
+    def record(self, filename: str, mime: str, media: str, status: str, sig_ok: bool,
+               sha256: str = None, cached: bool = False, price: float = 0.0):
+        """Queue one verification; never blocks the caller (rows are dropped and counted if the queue is full)."""
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((time.time(), filename, mime, media, status, int(bool(sig_ok)), sha256,
+                                    int(bool(cached)), price))
+        except queue.Full:
+            self._drop(1)
+
+    def _drop(self, n: int):
+        self.dropped += n
+        if self.on_drop is not None:
+            self.on_drop(n)
+
+    def _run(self):
+        db = self._connect()
+        while True:
+            rows = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(rows) < self.batch_size:
+                try:
+                    rows.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            stop = None in rows
+            rows = [r for r in rows if r is not None]
+            if rows:
+                try:
+                    self._write(db, rows)
+                except sqlite3.Error as exc:
+                    log.warning("ledger write failed, dropping %d rows: %s", len(rows), exc)
+                    self._drop(len(rows))
+            for _ in range(len(rows) + stop):
+                self._queue.task_done()
+            if stop:
+                db.close()
+                return
+
+    def _write(self, db: sqlite3.Connection, rows):
+        rollup = {}
+        for ts, _, _, media, status, sig_valid, _, _, price in rows:
+            for width in BUCKETS.values():
+                key = (width, int(ts // width) * width, media, status)
+                count, valid, revenue = rollup.get(key, (0, 0, 0.0))
+                rollup[key] = (count + 1, valid + sig_valid, revenue + price)
+        with db:
+            db.executemany("INSERT INTO verifications (ts, filename, mime, media, status, sig_valid, sha256, cached, price)"
+                           " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            db.executemany("INSERT INTO verification_rollup (width, bucket, media, status, count, sig_valid, revenue)"
+                           " VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (width, bucket, media, status) DO UPDATE SET"
+                           " count = count + excluded.count, sig_valid = sig_valid + excluded.sig_valid,"
+                           " revenue = revenue + excluded.revenue",
+                           [key + value for key, value in rollup.items()])
+        self.written += len(rows)
+
+    def flush(self):
+        """Block until every queued row is written."""
+        self._queue.join()
+
+    def close(self):
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout=10)
+
+    # ----- reads -----
+    def history(self, limit: int = 50, cursor: int = None, status: str = None, sha256: str = None,
+                since: float = None, until: float = None) -> dict:
+        """Newest first, keyset-paginated on id: pass the returned next_cursor to get the next page."""
+        where, args = [], []
+        for clause, value in (("id < ?", cursor), ("status = ?", status), ("sha256 = ?", sha256),
+                              ("ts >= ?", since), ("ts < ?", until)):
+            if value is not None:
+                where.append(clause)
+                args.append(value)
+        limit = min(max(int(limit), 1), 1000)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM verifications"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        rows = self._reader().execute(sql + " ORDER BY id DESC LIMIT ?", args + [limit + 1]).fetchall()
+        items = [dict(zip(COLUMNS, r), sig_valid=bool(r[6]), cached=bool(r[8])) for r in rows[:limit]]
+        return {'items': items, 'next_cursor': items[-1]['id'] if len(rows) > limit else None}
+
+    def aggregate(self, bucket: str = 'hour', since: float = None, until: float = None,
+                  status: str = None, media: str = None) -> list:
+        """Per-bucket counts from the rollup table; cost depends on the number of buckets, not rows."""
+        width = BUCKETS[bucket]
+        where, args = ["width = ?"], [width]
+        for clause, value in (("bucket >= ?", None if since is None else int(since // width) * width),
+                              ("bucket < ?", until), ("status = ?", status), ("media = ?", media)):
+            if value is not None:
+                where.append(clause)
+                args.append(value)
+        rows = self._reader().execute(
+            "SELECT bucket, status, SUM(count), SUM(sig_valid), SUM(revenue) FROM verification_rollup"
+            f" WHERE {' AND '.join(where)} GROUP BY bucket, status ORDER BY bucket", args).fetchall()
+        return [{'start': b, 'status': s, 'count': c, 'signature_valid': v, 'revenue': r} for b, s, c, v, r in rows]
+
+    def totals(self) -> dict:
+        """All-time totals (from the daily rollup), surviving restarts."""
+        rows = self._reader().execute("SELECT status, SUM(count), SUM(revenue) FROM verification_rollup"
+                                      " WHERE width = ? GROUP BY status", (BUCKETS['day'],)).fetchall()
+        by_status = {s: c for s, c, _ in rows}
+        return {'total': sum(by_status.values()), 'verified': by_status.get('AI Generated', 0),
+                'unverified': sum(c for s, c in by_status.items() if s != 'AI Generated'),
+                'revenue': sum(r for _, _, r in rows), 'by_status': by_status}
+
+    def stats(self) -> dict:
+        """This process's writer (each worker has its own)."""
+        return {'written': self.written, 'dropped': self.dropped, 'queued': self._queue.qsize()}
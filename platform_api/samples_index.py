@@ -0,0 +1,118 @@
+# platform_api/samples_index.py
+# In-memory index of the demo samples directory, with content ETags and an
+# on-disk thumbnail cache. The directory is rescanned only when its mtime
+# changes; single files are re-stat'ed when served so in-place edits show up.
+import os, hashlib, mimetypes, tempfile, threading
+from email.utils import formatdate, parsedate_to_datetime
+from PIL import Image
+
+THUMB_MIN, THUMB_MAX, THUMB_STEP = 32, 1024, 32
+THUMB_FORMATS = {"webp": ("WEBP", "image/webp"), "jpeg": ("JPEG", "image/jpeg")}
+
+class SampleEntry:
+    __slots__ = ("name", "path", "size", "mtime_ns", "mime", "_etag")
+
+    def __init__(self, name: str, path: str, st):
+        self.name, self.path = name, path
+        self.size, self.mtime_ns = st.st_size, st.st_mtime_ns
+        self.mime = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        self._etag = None
+
+    @property
+    def etag(self) -> str:
+        """Strong ETag: SHA-256 of the file contents, computed once per (size, mtime)."""
+        if self._etag is None:
+            h = hashlib.sha256()
+            with open(self.path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    h.update(block)
+            self._etag = '"' + h.hexdigest()[:32] + '"'
+        return self._etag
+
+    @property
+    def last_modified(self) -> str:
+        return formatdate(self.mtime_ns / 1e9, usegmt=True)
+
+    def not_modified(self, if_none_match: str = None, if_modified_since: str = None) -> bool:
+        """Conditional GET check; If-None-Match wins over If-Modified-Since (RFC 9110)."""
+        if if_none_match:
+            tags = [t.strip() for t in if_none_match.split(",")]
+            return "*" in tags or self.etag in tags or ("W/" + self.etag) in tags
+        if if_modified_since:
+            try:
+                return int(self.mtime_ns // 1_000_000_000) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+class SampleIndex:
+    def __init__(self, directory: str, thumb_dir: str = None):
+        self.directory = directory
+        self.thumb_dir = thumb_dir or os.path.join(tempfile.gettempdir(), "reke-thumbs")
+        self._entries = {}
+        self._names = []
+        self._dir_mtime = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._dir_mtime:
+            return
+        entries = {}
+        if mtime is not None:
+            with os.scandir(self.directory) as it:
+                for de in it:
+                    if de.is_file() and not de.name.startswith("."):
+                        old = self._entries.get(de.name)
+                        st = de.stat()
+                        same = old and (old.size, old.mtime_ns) == (st.st_size, st.st_mtime_ns)
+                        entries[de.name] = old if same else SampleEntry(de.name, de.path, st)
+        self._entries, self._names, self._dir_mtime = entries, sorted(entries), mtime
+
+    def names(self) -> list:
+        with self._lock:
+            self._refresh()
+            return self._names
+
+    def get(self, name: str):
+        """Entry for `name` if it is a sample (never a path outside the directory), else None."""
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            try:
+                st = os.stat(entry.path)
+            except FileNotFoundError:
+                return None
+            if (st.st_size, st.st_mtime_ns) != (entry.size, entry.mtime_ns):
+                entry = self._entries[name] = SampleEntry(name, entry.path, st)
+            return entry
+
+    @staticmethod
+    def thumb_width(width: int) -> int:
+        """Clamp and round the requested width so the cache holds a bounded set of variants."""
+        width = min(max(int(width), THUMB_MIN), THUMB_MAX)
+        return -(-width // THUMB_STEP) * THUMB_STEP
+
+    def thumbnail(self, entry: SampleEntry, width: int, fmt: str = "webp") -> str:
+        """Path of a cached `width`-wide thumbnail of `entry`, building it on first use."""
+        pil_format, _ = THUMB_FORMATS[fmt]
+        width = self.thumb_width(width)
+        path = os.path.join(self.thumb_dir, f"{entry.etag.strip(chr(34))}-{width}.{fmt}")
+        if os.path.exists(path):
+            return path
+        os.makedirs(self.thumb_dir, exist_ok=True)
+        with Image.open(entry.path) as img:
+            # JPEG: let the decoder downscale by 1/2..1/8 in the DCT before resampling
+            img.draft("RGB", (width, width * img.height // max(img.width, 1)))
+            img = img.convert("RGBA" if fmt == "webp" and img.mode in ("RGBA", "LA", "P") else "RGB")
+            img.thumbnail((width, width * 4), Image.LANCZOS)
+            fd, tmp = tempfile.mkstemp(dir=self.thumb_dir, suffix="." + fmt)
+            with os.fdopen(fd, "wb") as f:
+                img.save(f, pil_format, quality=80)
+        os.replace(tmp, path)  # atomic: concurrent builders never expose half-written files
+        return path
@@ -0,0 +1,264 @@
+# platform_api/sdk/reke_client.py
+# Client for the Reke platform API (demo), sync and asyncio.
+# One keep-alive connection pool per client, a cap on requests in flight,
+# uploads streamed from disk with a known Content-Length, retries with full
+# jitter on 429/503 (honouring Retry-After), and verify_many() packing files
+# into /verify/batch requests when the server offers that route.
+#
+#   with RekeClient("http://localhost:8000") as client:
+#       client.verify("photo.png")                # -> {'status': 'AI Generated', ...}
+#       client.verify_many(paths)                 # batched, results in input order
+#
+#   async with AsyncRekeClient(url) as client:    # needs httpx
+#       await client.verify_many(paths)
+import os, time, uuid, random, asyncio, mimetypes, threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_URL = os.getenv("REKE_API_URL", "http://localhost:8000")
+RETRY_STATUS = (429, 503)
+UPLOAD_CHUNK = 1024 * 1024
+
+class RekeAPIError(Exception):
+    def __init__(self, status_code: int, payload=None):
+        error = payload.get('error') if isinstance(payload, dict) else payload
+        super().__init__(f"API error {status_code}" + (f": {error}" if error else ""))
+        self.status_code, self.payload = status_code, payload
+
+# ----- Uploads -----
+def _upload(src, filename: str = None, mime: str = None):
+    """(filename, mime, source): paths stay on disk, file objects are read once so retries can replay them."""
+    if isinstance(src, (str, os.PathLike)):
+        path = os.fspath(src)
+        filename = filename or os.path.basename(path)
+        source = (path, os.stat(path).st_size)
+    elif isinstance(src, (bytes, bytearray, memoryview)):
+        source = bytes(src)
+    else:
+        filename = filename or os.path.basename(getattr(src, "name", "") or "") or None
+        source = src.read()
+    filename = filename or "upload"
+    return filename, mime or mimetypes.guess_type(filename)[0] or "application/octet-stream", source
+
+def _size(source) -> int:
+    return source[1] if isinstance(source, tuple) else len(source)
+
+class _Multipart:
+    """multipart/form-data body of file fields, iterated in chunks (paths are read as it is sent)."""
+    def __init__(self, field: str, uploads):
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        self._segments = []
+        for filename, mime, source in uploads:
+            quoted = filename.replace("\\", "\\\\").replace('"', '\\"').replace("\r", "").replace("\n", "")
+            self._segments += [(f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; '
+                                f'filename="{quoted}"\r\nContent-Type: {mime}\r\n\r\n').encode(), source, b"\r\n"]
+        self._segments.append(f"--{boundary}--\r\n".encode())
+        self.length = sum(_size(s) for s in self._segments)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self):
+        for segment in self._segments:
+            if isinstance(segment, tuple):
+                with open(segment[0], "rb") as f:
+                    yield from iter(lambda: f.read(UPLOAD_CHUNK), b"")
+            elif segment:
+                yield segment
+
+    async def aiter(self):
+        for segment in self._segments:
+            if isinstance(segment, tuple):
+                with open(segment[0], "rb") as f:
+                    while chunk := await asyncio.to_thread(f.read, UPLOAD_CHUNK):
+                        yield chunk
+            elif segment:
+                yield segment
+
+_PROBE = ("probe", "text/plain", b"")
+
+def _batches(uploads, max_items: int, max_bytes: int):
+    """Consecutive (start, uploads) groups bounded by item count and total upload size."""
+    start, group, size = 0, [], 0
+    for i, upload in enumerate(uploads):
+        if group and (len(group) >= max_items or size + _size(upload[2]) > max_bytes):
+            yield start, group
+            start, group, size = i, [], 0
+        group.append(upload)
+        size += _size(upload[2])
+    if group:
+        yield start, group
+
+def _payload(r):
+    """JSON body of a requests/httpx response, or its text."""
+    try:
+        return r.json()
+    except ValueError:
+        return r.text
+
+def _batch_results(payload: dict, count: int) -> list:
+    results = sorted(payload.get('results', []), key=lambda r: r['index'])
+    if len(results) != count:  # e.g. an archive the server expanded into several items
+        raise RekeAPIError(200, {'error': f"batch returned {len(results)} results for {count} uploads"})
+    return [{k: v for k, v in r.items() if k != 'index'} for r in results]
+
+class _Settings:
+    """Options and retry policy shared by both clients."""
+    def __init__(self, base_url: str = DEFAULT_URL, timeout=(5.0, 60.0), pool_size: int = 16,
+                 max_concurrency: int = 8, retries: int = 4, backoff: float = 0.5, max_backoff: float = 10.0,
+                 batch_size: int = 32, batch_bytes: int = 64 * 1024 * 1024):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        self.pool_size, self.max_concurrency = max(1, pool_size), max(1, max_concurrency)
+        self.retries, self.backoff, self.max_backoff = max(0, retries), backoff, max_backoff
+        self.batch_size, self.batch_bytes = max(1, batch_size), batch_bytes
+        self._batch = None  # /verify/batch available? learnt on first use
+
+    def _delay(self, attempt: int, retry_after) -> float:
+        """Full jitter on an exponential cap, but never sooner than the server's Retry-After."""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        try:
+            return max(delay, float(retry_after))
+        except (TypeError, ValueError):
+            return delay
+
+    @staticmethod
+    def _result(status_code: int, payload):
+        if status_code >= 400:
+            raise RekeAPIError(status_code, payload)
+        return payload
+
+# ----- Sync client (requests) -----
+class RekeClient(_Settings):
+    def __init__(self, base_url: str = DEFAULT_URL, **options):
+        import requests
+        from requests.adapters import HTTPAdapter
+        super().__init__(base_url, **options)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._session.close()
+
+    def _post(self, path: str, uploads, field: str):
+        for attempt in range(self.retries + 1):
+            body = _Multipart(field, uploads)
+            with self._slots:
+                r = self._session.post(self.base_url + path, data=body, timeout=self.timeout,
+                                       headers={'Content-Type': body.content_type})
+            if r.status_code not in RETRY_STATUS or attempt == self.retries:
+                return r
+            r.close()
+            time.sleep(self._delay(attempt, r.headers.get('Retry-After')))
+
+    def verify(self, src, filename: str = None, mime: str = None) -> dict:
+        """Verify one file (path, bytes or file object); returns the /verify/ JSON."""
+        return self._verify_upload(_upload(src, filename, mime))
+
+    def _verify_upload(self, upload) -> dict:
+        r = self._post("/verify/", [upload], "file")
+        return self._result(r.status_code, _payload(r))
+
+    def _has_batch(self) -> bool:
+        # a form without `files` costs one round-trip and no upload: 422 means the route exists
+        if self._batch is None:
+            self._batch = self._post("/verify/batch", [_PROBE], "probe").status_code not in (404, 405)
+        return self._batch
+
+    def _verify_batch(self, uploads) -> list:
+        r = self._post("/verify/batch", uploads, "files")
+        if r.status_code in (404, 405):
+            self._batch = False
+            return None
+        return _batch_results(self._result(r.status_code, _payload(r)), len(uploads))
+
+    def verify_many(self, sources) -> list:
+        """Verify many files, batched onto /verify/batch (or one /verify/ each); results in input order."""
+        uploads = [_upload(src) for src in sources]
+        results = [None] * len(uploads)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            if self._has_batch():
+                groups = list(_batches(uploads, self.batch_size, self.batch_bytes))
+                for (start, group), found in zip(groups, pool.map(self._verify_batch, [g for _, g in groups])):
+                    if found is not None:
+                        results[start:start + len(group)] = found
+            todo = [i for i, r in enumerate(results) if r is None]
+            for i, found in zip(todo, pool.map(self._verify_upload, [uploads[i] for i in todo])):
+                results[i] = found
+        return results
+
+# ----- Async client (httpx) -----
+class AsyncRekeClient(_Settings):
+    def __init__(self, base_url: str = DEFAULT_URL, **options):
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError("AsyncRekeClient needs httpx (pip install httpx)") from None
+        super().__init__(base_url, **options)
+        connect, read = self.timeout
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read, connect=connect),
+            limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size))
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def _post(self, path: str, uploads, field: str):
+        for attempt in range(self.retries + 1):
+            body = _Multipart(field, uploads)
+            async with self._slots:
+                r = await self._client.post(self.base_url + path, content=body.aiter(),
+                                            headers={'Content-Type': body.content_type,
+                                                     'Content-Length': str(body.length)})
+            if r.status_code not in RETRY_STATUS or attempt == self.retries:
+                return r
+            await asyncio.sleep(self._delay(attempt, r.headers.get('Retry-After')))
+
+    async def verify(self, src, filename: str = None, mime: str = None) -> dict:
+        return await self._verify_upload(_upload(src, filename, mime))
+
+    async def _verify_upload(self, upload) -> dict:
+        r = await self._post("/verify/", [upload], "file")
+        return self._result(r.status_code, _payload(r))
+
+    async def _has_batch(self) -> bool:
+        if self._batch is None:
+            self._batch = (await self._post("/verify/batch", [_PROBE], "probe")).status_code not in (404, 405)
+        return self._batch
+
+    async def _verify_batch(self, uploads):
+        r = await self._post("/verify/batch", uploads, "files")
+        if r.status_code in (404, 405):
+            self._batch = False
+            return None
+        return _batch_results(self._result(r.status_code, _payload(r)), len(uploads))
+
+    async def verify_many(self, sources) -> list:
+        uploads = [_upload(src) for src in sources]
+        results = [None] * len(uploads)
+        if await self._has_batch():
+            groups = list(_batches(uploads, self.batch_size, self.batch_bytes))
+            found = await asyncio.gather(*(self._verify_batch(g) for _, g in groups))
+            for (start, group), batch in zip(groups, found):
+                if batch is not None:
+                    results[start:start + len(group)] = batch
+        todo = [i for i, r in enumerate(results) if r is None]
+        for i, found in zip(todo, await asyncio.gather(*(self._verify_upload(uploads[i]) for i in todo))):
+            results[i] = found
+        return results
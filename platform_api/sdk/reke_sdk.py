@@ -1,12 +1,23 @@
 # platform_api/sdk/reke_sdk.py
 # Demo Reke SDK: Tree-Ring-like watermark (images) + hybrid video (optional).
 # This is a prototype demo for investor-facing demos (not production).
-import os, io, json, hashlib, hmac, subprocess, tempfile
+# Import stays light for cold starts: subprocess/asyncio (video), sqlite3
+# (perceptual index) and PIL's PNG encoder are imported where first used, and
+# PIL decoders register on first open; warm_up() primes them ahead of traffic.
+import os, io, json, time, hashlib, hmac, tempfile, threading, zlib, mmap
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, asynccontextmanager
 from datetime import datetime, timezone
-from PIL import Image, PngImagePlugin
+import numpy as np
+from PIL import Image
 
 REKE_SECRET = os.getenv("REKE_SECRET", "reke_demo_secret")
 WATERMARK_MARK = "REKE-TR-DEMO"
+# LSB signal region as (x, y, width, height); clipped to the image bounds.
+LSB_REGION = (0, 0, 32, 32)
+FFMPEG = os.getenv("REKE_FFMPEG", "ffmpeg")
+FFPROBE = os.getenv("REKE_FFPROBE", "ffprobe")
 
 def _now_iso():
     return datetime.now(timezone.utc).isoformat()
@@ -14,8 +25,16 @@ def _now_iso():
 def _content_hash_bytes(data: bytes) -> str:
     return hashlib.sha256(data).hexdigest()
 
+_hmac_keys = {}
+
 def _hmac_sig(content_hash: str) -> str:
-    return hmac.new(REKE_SECRET.encode(), content_hash.encode(), hashlib.sha256).hexdigest()
+    # the keyed state (padded key blocks) is set up once per secret and copied per message
+    keyed = _hmac_keys.get(REKE_SECRET)
+    if keyed is None:
+        keyed = _hmac_keys[REKE_SECRET] = hmac.new(REKE_SECRET.encode(), digestmod=hashlib.sha256)
+    h = keyed.copy()
+    h.update(content_hash.encode())
+    return h.hexdigest()
 
 def _build_manifest(origin: str, content_hash: str) -> dict:
     return {
@@ -27,157 +46,1352 @@ def _build_manifest(origin: str, content_hash: str) -> dict:
         "sig": _hmac_sig(content_hash)
     }
 
-# ----- Images: embed + verify -----
-def embed_image_treering(image_path: str, output_path: str, origin: str = "Fake AI Generator") -> str:
+@contextmanager
+def _stage(timings, name: str):
+    """Add the wall time of the block to timings[name] (seconds); no-op when timings is None."""
+    if timings is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - t0
+
+# ----- Input sources -----
+def _map_file(f):
+    if os.fstat(f.fileno()).st_size == 0:
+        return b""
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _as_buffer(src):
     """
-    Embed demo Tree-Ring watermark into PNG:
-     - compute content hash of pixels
-     - build manifest (JSON) and store in PNG tEXt
-     - embed tiny LSB pattern in red channel first 32x32 area as signal
-    Returns output_path.
+    Zero-copy buffer over `src`: bytes-like objects and mmaps pass through,
+    BytesIO exposes its buffer, paths and real files are mmap'd, and any
+    other file-like object is read().
     """
-    img = Image.open(image_path).convert("RGBA")
-    pixels = img.tobytes()
-    content_hash = _content_hash_bytes(pixels)
-    manifest = _build_manifest(origin, content_hash)
-    pnginfo = PngImagePlugin.PngInfo()
-    pnginfo.add_text("reke_manifest", json.dumps(manifest))
-    sig = _hmac_sig(content_hash)
+    if isinstance(src, (bytes, bytearray, memoryview, mmap.mmap)):
+        return src
+    if isinstance(src, (str, os.PathLike)):
+        with open(src, "rb") as f:
+            return _map_file(f)
+    if isinstance(src, io.BytesIO):
+        return src.getbuffer()
+    try:
+        return _map_file(src)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        return src.read()
+
+def _existing_path(src):
+    """`src` as a filesystem path when it already is one (a path or a named, flushed file), else None."""
+    if isinstance(src, (str, os.PathLike)):
+        return os.fspath(src)
+    name = getattr(src, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        if hasattr(src, "flush"):
+            src.flush()
+        return name
+    return None
+
+def _spill(src) -> str:
+    """Write a buffer or stream to a new temp file and return its name (the caller removes it)."""
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
+    try:
+        with tmp:
+            tmp.write(_as_buffer(src))
+    except BaseException:
+        _unlink(tmp.name)
+        raise
+    return tmp.name
+
+def _unlink(path: str):
+    try: os.unlink(path)
+    except OSError: pass
+
+@contextmanager
+def _video_path(src):
+    """Yield a filesystem path for `src`, spilling buffers and streams to a temp file when needed."""
+    path = _existing_path(src)
+    if path is not None:
+        yield path
+        return
+    path = _spill(src)
+    try:
+        yield path
+    finally:
+        _unlink(path)
+
+@asynccontextmanager
+async def _video_path_async(src):
+    """_video_path for the event loop: the spill (up to the whole upload) runs in a worker thread."""
+    import asyncio
+    path = _existing_path(src)
+    if path is not None:
+        yield path
+        return
+    path = await asyncio.to_thread(_spill, src)
+    try:
+        yield path
+    finally:
+        _unlink(path)
+
+# ----- LSB bit plane (NumPy) -----
+def _lsb_box(size, region=LSB_REGION):
+    """Clip an (x, y, w, h) region to an image of `size` and return a PIL crop box."""
+    w, h = size
+    x, y, rw, rh = region
+    x0, y0 = min(max(x, 0), w), min(max(y, 0), h)
+    return (x0, y0, min(x0 + max(rw, 0), w), min(y0 + max(rh, 0), h))
+
+def _lsb_pattern_bits(pattern: bytes, shape) -> np.ndarray:
+    """Repeat the low bit of each pattern byte row-major over `shape`."""
+    bits = np.frombuffer(pattern, dtype=np.uint8) & 1
+    return np.resize(bits, shape[0] * shape[1]).reshape(shape)
+
+def _sig_pattern(sig: str) -> bytes:
     # create pattern bytes from sig hex
     try:
-        pattern = bytes.fromhex(sig)[:64]
+        return bytes.fromhex(sig)[:64]
+    except Exception:
+        return sig.encode()[:64]
+
+def _write_lsb(tile: np.ndarray, pattern: bytes) -> np.ndarray:
+    """Write the pattern into the red-channel LSBs of an (H, W, C) uint8 array, in place."""
+    tile[..., 0] = (tile[..., 0] & 0xFE) | _lsb_pattern_bits(pattern, tile.shape[:2])
+    return tile
+
+def _embed_lsb(img: Image.Image, pattern: bytes, region=LSB_REGION) -> Image.Image:
+    """Write the pattern into the red-channel LSBs of `region` of an RGBA image, in place."""
+    box = _lsb_box(img.size, region)
+    if box[2] <= box[0] or box[3] <= box[1]:
+        return img
+    tile = _write_lsb(np.array(img.crop(box)), pattern)
+    img.paste(Image.fromarray(tile, "RGBA"), box[:2])
+    return img
+
+def _read_lsb(img: Image.Image, region=LSB_REGION) -> np.ndarray:
+    """Return the red-channel LSB plane of `region` as a 2-D uint8 array (only the crop is converted)."""
+    box = _lsb_box(img.size, region)
+    if box[2] <= box[0] or box[3] <= box[1]:
+        return np.zeros((0, 0), dtype=np.uint8)
+    tile = img.crop(box)
+    if tile.mode != "RGBA":
+        tile = tile.convert("RGBA")
+    return np.asarray(tile)[..., 0] & 1
+
+def _manifest_region(manifest: dict):
+    try:
+        return tuple(int(v) for v in manifest.get("lsb_region", LSB_REGION))[:4]
+    except Exception:
+        return LSB_REGION
+
+# ----- Header-only container scan -----
+MANIFEST_KEY = "reke_manifest"
+MANIFEST_PREFIX = "REKE_MANIFEST:"
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_MAX_TEXT = 1 << 20  # cap for decompressed zTXt/iTXt payloads
+
+def _png_chunks(buf: memoryview):
+    """Yield (chunk_type, data_view) for each PNG chunk; stops quietly on truncation."""
+    pos, n = 8, len(buf)
+    while pos + 8 <= n:
+        length = int.from_bytes(buf[pos:pos + 4], "big")
+        ctype = bytes(buf[pos + 4:pos + 8])
+        end = pos + 8 + length
+        if end + 4 > n:
+            return
+        yield ctype, buf[pos + 8:end]
+        pos = end + 4
+
+def _png_text(ctype: bytes, data: memoryview):
+    """Decode a tEXt/zTXt/iTXt chunk to (key, text), or None if it cannot be read."""
+    raw = bytes(data)
+    key, sep, rest = raw.partition(b"\0")
+    if not sep:
+        return None
+    try:
+        if ctype == b"tEXt":
+            return key.decode("latin-1"), rest.decode("latin-1")
+        if ctype == b"zTXt":
+            return key.decode("latin-1"), zlib.decompressobj().decompress(rest[1:], _MAX_TEXT).decode("latin-1")
+        # iTXt: compression flag, method, language\0, translated keyword\0, text
+        flag = rest[0]
+        _lang, _, rest = rest[2:].partition(b"\0")
+        _tkey, _, text = rest.partition(b"\0")
+        if flag:
+            text = zlib.decompressobj().decompress(text, _MAX_TEXT)
+        return key.decode("latin-1"), text.decode("utf-8")
     except Exception:
-        pattern = sig.encode()[:64]
+        return None
+
+def _scan_png(buf: memoryview):
+    chunks = _png_chunks(buf)
+    first = next(chunks, None)
+    if first is None or first[0] != b"IHDR" or len(first[1]) != 13:
+        return None
+    for ctype, data in chunks:
+        if ctype in (b"tEXt", b"zTXt", b"iTXt"):
+            text = _png_text(ctype, data)
+            if text and text[0] == MANIFEST_KEY:
+                return "PNG", text[1]
+        elif ctype in (b"IDAT", b"IEND"):
+            # text chunks after the pixel data are not part of the manifest contract
+            return "PNG", None
+    return None
+
+def _scan_jpeg(buf: memoryview):
+    pos, n, seen_frame = 2, len(buf), False
+    while pos + 4 <= n:
+        if buf[pos] != 0xFF:
+            return None
+        marker = buf[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:  # standalone markers
+            pos += 2
+            continue
+        if marker == 0xDA:  # start of scan: no more header segments
+            return ("JPEG", None) if seen_frame else None
+        length = int.from_bytes(buf[pos + 2:pos + 4], "big")
+        if length < 2:
+            return None
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            seen_frame = True
+        elif marker == 0xFE:
+            comment = bytes(buf[pos + 4:pos + 2 + length]).decode("utf-8", "replace")
+            if comment.startswith(MANIFEST_PREFIX):
+                return "JPEG", comment[len(MANIFEST_PREFIX):]
+        pos += 2 + length
+    return None
+
+def _scan_webp(buf: memoryview):
+    # The SDK writes no manifest into WebP; a valid RIFF header is enough to answer.
+    if len(buf) < 20 or bytes(buf[12:16]) not in (b"VP8 ", b"VP8L", b"VP8X"):
+        return None
+    return "WEBP", None
+
+def _scan_manifest(data):
+    """
+    Find the manifest by walking container headers only (no pixel decode).
+    Returns (format, manifest_str_or_None), or None when the container is not
+    recognised or looks malformed (caller falls back to PIL).
+    """
+    buf = memoryview(data)
+    if bytes(buf[:8]) == _PNG_SIGNATURE:
+        return _scan_png(buf)
+    if bytes(buf[:2]) == b"\xff\xd8":
+        return _scan_jpeg(buf)
+    if bytes(buf[:4]) == b"RIFF" and bytes(buf[8:12]) == b"WEBP":
+        return _scan_webp(buf)
+    return None
+
+# 8-bit, non-interlaced PNG colour types that can be decoded row by row
+_PNG_ROW_MODES = {0: "L", 2: "RGB", 4: "LA", 6: "RGBA"}
+
+def _png_top_rows(data, rows: int) -> Image.Image:
+    """
+    Decode only the first `rows` rows of a PNG (enough for the LSB region).
+    Falls back to the lazily-opened full image for interlaced, 16-bit or palette files.
+    """
+    buf = memoryview(data)
+    w, h = int.from_bytes(buf[16:20], "big"), int.from_bytes(buf[20:24], "big")
+    bit_depth, color_type, interlace = buf[24], buf[25], buf[28]
+    mode = _PNG_ROW_MODES.get(color_type)
+    rows = min(rows, h)
+    if mode is None or bit_depth != 8 or interlace or rows <= 0:
+        return Image.open(io.BytesIO(data))
+    # filtered scanlines for `rows` rows; deflate never expands much beyond that
+    needed = rows * (1 + w * len(mode))
+    budget = needed + needed // 100 + 1024
+    parts, size = [], 0
+    for ctype, d in _png_chunks(buf):
+        if ctype == b"IDAT":
+            parts.append(d)
+            size += len(d)
+            if size >= budget:
+                break
+    try:
+        return Image.frombytes(mode, (w, rows), b"".join(parts), "zip", mode)
+    except Exception:
+        return Image.open(io.BytesIO(data))
+
+# ----- Tiled content hash -----
+# content_hash = SHA-256 over the per-tile SHA-256 digests (row-major) of the
+# RGBA pixels, with the red LSBs of the watermark region cleared so the hash
+# is the same before and after embedding. Bands of tiles are hashed on a
+# thread pool (hashlib releases the GIL) without copying the whole image.
+HASH_ALG = "reke-tiles-v1"
+HASH_TILE = 256
+_HINT_HEX = 16  # per-tile digest prefix kept in the manifest to localize edits
+_hash_pool = None
+
+def _hash_executor() -> ThreadPoolExecutor:
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="reke-hash")
+    return _hash_pool
+
+def _drop_hash_pool():
+    # threads do not survive fork: a forked worker builds its own pool on first use
+    global _hash_pool
+    _hash_pool = None
+
+os.register_at_fork(after_in_child=_drop_hash_pool)
+
+def _hash_tile(img: Image.Image, box, mask_box) -> bytes:
+    tile = img.crop(box)
+    mx0, my0, mx1, my1 = mask_box
+    if mx0 < box[2] and mx1 > box[0] and my0 < box[3] and my1 > box[1]:
+        arr = np.array(tile)
+        arr[max(my0 - box[1], 0):my1 - box[1], max(mx0 - box[0], 0):mx1 - box[0], 0] &= 0xFE
+        return hashlib.sha256(arr).digest()
+    return hashlib.sha256(tile.tobytes()).digest()
+
+def _hash_band(img: Image.Image, y0: int, y1: int, tile: int, mask_box) -> list:
+    """Digests of the tiles in rows [y0, y1) of an RGBA image; only one tile is copied at a time."""
+    return [_hash_tile(img, (x, y0, min(x + tile, img.width), y1), mask_box) for x in range(0, img.width, tile)]
 
+def _tile_digests(img: Image.Image, region=LSB_REGION, tile: int = HASH_TILE) -> list:
+    """Row-major per-tile SHA-256 digests of an RGBA image, LSB region masked."""
+    img.load()
+    mask = _lsb_box(img.size, region)
+    starts = range(0, img.height, tile)
+    band = lambda y: _hash_band(img, y, min(y + tile, img.height), tile, mask)
+    bands = map(band, starts) if len(starts) <= 1 else _hash_executor().map(band, starts)
+    return [d for digests in bands for d in digests]
+
+def _merkle_root(digests, size, tile: int) -> str:
+    h = hashlib.sha256(f"{HASH_ALG}:{size[0]}x{size[1]}:{tile}:".encode())
+    for d in digests:
+        h.update(d)
+    return h.hexdigest()
+
+def _changed_tiles(digests, hints, size, tile: int) -> list:
+    """(x, y, w, h) of every tile whose digest no longer matches the manifest hint."""
+    cols = -(-size[0] // tile)
+    boxes = []
+    for i, d in enumerate(digests):
+        if i >= len(hints) or d.hex()[:_HINT_HEX] != hints[i]:
+            x, y = (i % cols) * tile, (i // cols) * tile
+            boxes.append((x, y, min(tile, size[0] - x), min(tile, size[1] - y)))
+    return boxes
+
+def _check_content_hash(manifest: dict, img: Image.Image, timings=None, changed_tiles=None) -> bool:
+    """
+    Strict mode: recompute the tiled hash and compare it with the signed content_hash.
+    Manifests without a tiled hash (older SDKs hashed the pixels before
+    watermarking) cannot be recomputed and fail.
+    """
+    spec = manifest.get("hash")
+    if not isinstance(spec, dict) or spec.get("alg") != HASH_ALG:
+        return False
+    try:
+        tile = max(16, int(spec.get("tile", HASH_TILE)))
+        with _stage(timings, "decode"):
+            if img.mode != "RGBA":
+                img = img.convert("RGBA")
+            img.load()
+        with _stage(timings, "content_hash"):
+            digests = _tile_digests(img, _manifest_region(manifest), tile)
+    except Exception:
+        return False
+    if list(img.size) == list(spec.get("size", ())) and _merkle_root(digests, img.size, tile) == manifest.get("content_hash"):
+        return True
+    if changed_tiles is not None:
+        if list(img.size) != list(spec.get("size", ())):
+            changed_tiles.append((0, 0, img.width, img.height))
+        else:
+            changed_tiles.extend(_changed_tiles(digests, spec.get("tiles") or [], img.size, tile))
+    return False
+
+# ----- Frequency-domain ring watermark -----
+# Equal energy on every frequency of a set of concentric rings, with
+# key-derived phases, is added to the image luminance. The pattern is defined
+# on a fixed RING_SIZE x RING_SIZE grid and stretched to the image. Detection
+# downscales the luminance back to that grid (JPEGs are decoded at 1/2..1/8
+# scale), takes one FFT and correlates the phases on the rings with the key,
+# so its cost does not depend on the input resolution. It survives
+# re-encoding and resizing, unlike the LSB tile.
+RING_ALG = "reke-ring-v1"
+RING_SIZE = 128
+RING_RADII = tuple(range(18, 49, 3))  # cycles per image; below Nyquist for RING_MIN_SIDE
+RING_STRENGTH = 3.0  # std of the added luminance pattern, in 8-bit levels
+RING_THRESHOLD = 0.12  # clean images score ~N(0, 0.021)
+RING_MIN_SIDE = 128
+_ring_keys = {}
+_ring_patterns = {}
+
+def _ring_key():
+    """(rows, cols, phases) of the rfft2 bins carrying the key for the current REKE_SECRET."""
+    key = _ring_keys.get(REKE_SECRET)
+    if key is not None:
+        return key
+    seed = hmac.new(REKE_SECRET.encode(), RING_ALG.encode(), hashlib.sha256).digest()
+    rng = np.random.default_rng(np.frombuffer(seed, dtype=np.uint32))
+    n = RING_SIZE
+    fy = np.fft.fftfreq(n, 1.0 / n).astype(int)[:, None]
+    fx = np.arange(n // 2 + 1)[None, :]
+    radius = np.rint(np.hypot(fy, fx)).astype(int)
+    # skip the axes, where the image border puts most of its energy
+    usable = (fx >= 2) & (np.abs(fy) >= 2) & np.isin(radius, RING_RADII)
+    rows, cols = np.nonzero(usable)
+    key = _ring_keys[REKE_SECRET] = (rows, cols, rng.uniform(0, 2 * np.pi, len(rows)))
+    return key
+
+def _ring_pattern() -> np.ndarray:
+    """Unit-std RING_SIZE x RING_SIZE luminance pattern: equal energy on every ring bin, key phases."""
+    pattern = _ring_patterns.get(REKE_SECRET)
+    if pattern is not None:
+        return pattern
+    rows, cols, phases = _ring_key()
+    spec = np.zeros((RING_SIZE, RING_SIZE // 2 + 1), dtype=np.complex128)
+    spec[rows, cols] = np.exp(1j * phases)
+    pattern = np.fft.irfft2(spec, s=(RING_SIZE, RING_SIZE))
+    pattern = _ring_patterns[REKE_SECRET] = (pattern / pattern.std()).astype(np.float32)
+    return pattern
+
+def _stretch_matrix(length: int, n: int = RING_SIZE) -> np.ndarray:
+    """(length, n) periodic linear-interpolation weights mapping the n-grid onto `length` pixels."""
+    pos = (np.arange(length) + 0.5) * n / length - 0.5
+    lo = np.floor(pos).astype(int)
+    frac = (pos - lo).astype(np.float32)
+    m = np.zeros((length, n), dtype=np.float32)
+    m[np.arange(length), lo % n] += 1 - frac
+    m[np.arange(length), (lo + 1) % n] += frac
+    return m
+
+def _embed_ring(img: Image.Image, strength: float = RING_STRENGTH, band: int = 256) -> bool:
+    """Add the ring pattern to the RGB channels of an RGBA image, a band of rows at a time."""
     w, h = img.size
-    px = img.load()
-    idx = 0
-    for y in range(min(h, 32)):
-        for x in range(min(w, 32)):
-            r, g, b, a = px[x, y]
-            bit = (pattern[idx % len(pattern)] & 1)
-            r = (r & ~1) | bit
-            px[x, y] = (r, g, b, a)
-            idx += 1
+    if min(w, h) < RING_MIN_SIDE or strength <= 0:
+        return False
+    cols = _ring_pattern() @ _stretch_matrix(w).T * strength  # (n, w)
+    rows = _stretch_matrix(h)
+    for y in range(0, h, band):
+        y1 = min(y + band, h)
+        tile = np.array(img.crop((0, y, w, y1)))
+        delta = rows[y:y1] @ cols
+        tile[..., :3] = np.clip(tile[..., :3] + np.rint(delta)[..., None], 0, 255)
+        img.paste(Image.fromarray(tile, "RGBA"), (0, y))
+    return True
+
+def _ring_delta(width: int, height: int, strength: float = RING_STRENGTH):
+    """Full-frame int16 luminance offsets of the ring pattern (video frames), or None if too small."""
+    if min(width, height) < RING_MIN_SIDE or strength <= 0:
+        return None
+    cols = _ring_pattern() @ _stretch_matrix(width).T * strength
+    return np.rint(_stretch_matrix(height) @ cols).astype(np.int16)
+
+def _ring_plane(src) -> np.ndarray:
+    """RING_SIZE x RING_SIZE float32 luminance of an image, path, bytes or file."""
+    img = src if isinstance(src, Image.Image) else Image.open(io.BytesIO(_as_buffer(src)))
+    img.draft("L", (RING_SIZE, RING_SIZE))  # JPEG: downscale in the DCT instead of decoding full size
+    if img.mode != "L":
+        img = img.convert("L")
+    return np.asarray(img.resize((RING_SIZE, RING_SIZE), Image.BOX), dtype=np.float32)
+
+def ring_scores(planes) -> np.ndarray:
+    """Key correlation score for each plane of a (B, RING_SIZE, RING_SIZE) stack, in one batched FFT."""
+    rows, cols, phases = _ring_key()
+    vals = np.fft.rfft2(np.asarray(planes, dtype=np.float32))[:, rows, cols]
+    # phase-only matched filter: per-bin |F| normalisation whitens the image's 1/f spectrum
+    return (np.real(vals * np.exp(-1j * phases)) / (np.abs(vals) + 1e-6)).mean(axis=1)
+
+def detect_ring_batch(images, threshold: float = RING_THRESHOLD) -> list:
+    """
+    Ring detection for many images: decodes/downscales on the hash thread pool,
+    then scores all planes with one FFT. Returns [(detected, score)] in input
+    order; undecodable inputs give (False, 0.0).
+    """
+    def plane(src):
+        try:
+            return _ring_plane(src)
+        except Exception:
+            return None
+    images = list(images)
+    planes = list(_hash_executor().map(plane, images)) if len(images) > 1 else [plane(i) for i in images]
+    ok = [i for i, p in enumerate(planes) if p is not None]
+    results = [(False, 0.0)] * len(planes)
+    if ok:
+        for i, score in zip(ok, ring_scores(np.stack([planes[i] for i in ok]))):
+            results[i] = (bool(score >= threshold), float(score))
+    return results
+
+def detect_ring(image, threshold: float = RING_THRESHOLD):
+    """(detected, score) for one image (PIL image, path, bytes or file)."""
+    return detect_ring_batch([image], threshold)[0]
+
+# ----- Perceptual hash index -----
+# A 64-bit pHash (sign of the low 8x8 DCT coefficients against their median,
+# taken from the same 128x128 luminance plane the ring detector uses) is
+# registered for every embedded image, so a re-saved or screenshotted copy
+# that lost its manifest can be matched back to it. The index is a
+# multi-index hash table: each hash is split into PHASH_CHUNKS 16-bit chunks
+# and, by pigeonhole, any hash within distance d of the query matches the
+# query in at least one chunk within d // PHASH_CHUNKS bits. A lookup
+# therefore probes a few hundred buckets and compares only their entries,
+# whatever the table size. Rows live in SQLite; the in-memory table is
+# rebuilt from it in bulk, with recent rows kept in a small unsorted tail.
+PHASH_ALG = "reke-phash-v1"
+PHASH_INDEX = os.getenv("REKE_PHASH_INDEX", "")  # SQLite path; empty disables registration and lookup
+PHASH_DISTANCE = int(os.getenv("REKE_PHASH_DISTANCE", "8"))  # max Hamming distance (of 64 bits) for a match
+PHASH_CHUNKS = 4
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+_dct_matrix = None
+_phash_indexes = {}
+
+def _dct32() -> np.ndarray:
+    global _dct_matrix
+    if _dct_matrix is None:
+        k, n = np.arange(32)[:, None], np.arange(32)[None, :]
+        m = np.cos(np.pi * (2 * n + 1) * k / 64) * np.sqrt(2 / 32)
+        m[0] /= np.sqrt(2)
+        _dct_matrix = m.astype(np.float32)
+    return _dct_matrix
+
+def _phash_plane(plane: np.ndarray) -> int:
+    """pHash of a RING_SIZE x RING_SIZE luminance plane (box-averaged to 32x32 first)."""
+    f = RING_SIZE // 32
+    small = plane.reshape(32, f, 32, f).mean(axis=(1, 3))
+    low = (_dct32() @ small @ _dct32().T)[:8, :8]
+    return int.from_bytes(np.packbits(low > np.median(low)).tobytes(), "big")
+
+def perceptual_hash(image) -> int:
+    """64-bit perceptual hash of an image (PIL image, path, bytes or file)."""
+    return _phash_plane(_ring_plane(image))
+
+def _popcount64(values: np.ndarray) -> np.ndarray:
+    return _POPCOUNT8[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+_chunk_mask_cache = {}
+
+def _chunk_masks(bits: int) -> np.ndarray:
+    """Every 16-bit mask with at most `bits` bits set."""
+    masks = _chunk_mask_cache.get(bits)
+    if masks is None:
+        masks = np.arange(1 << 16, dtype=np.int64)
+        masks = _chunk_mask_cache[bits] = masks[_POPCOUNT8[masks & 0xFF] + _POPCOUNT8[masks >> 8] <= bits]
+    return masks
+
+class PerceptualIndex:
+    """
+    pHash -> manifest index persisted in SQLite, safe to share between
+    processes (each one opens its own connection and picks up rows committed
+    by others on the next lookup). Rows are appended only.
+    """
+    def __init__(self, path: str, rebuild_every: int = 4096):
+        self.path, self.rebuild_every = path, rebuild_every
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork)
+        self._conn, self._conn_pid, self._version = None, None, None
+        with self._db() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS phash (id INTEGER PRIMARY KEY, hash INTEGER NOT NULL,"
+                       " manifest TEXT NOT NULL)")
+        self._ids = np.zeros(0, dtype=np.int64)      # row ids in the chunk tables
+        self._hashes = np.zeros(0, dtype=np.uint64)
+        self._order = self._starts = None           # per chunk: ids sorted by chunk value, bucket offsets
+        self._tail_ids, self._tail_hashes = [], []  # rows added since the last rebuild
+        self._last_id = 0
+        self._refresh()
+
+    def _after_fork(self):
+        self._lock = threading.Lock()  # another thread may have held it at fork time
+
+    def _db(self):
+        # connections must not cross a fork: each process opens its own
+        if self._conn_pid != os.getpid():
+            import sqlite3
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn_pid, self._version = os.getpid(), None
+        return self._conn
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._ids) + len(self._tail_ids)
+
+    def add(self, phash: int, manifest: dict):
+        """Register one hash."""
+        self.add_many([(phash, manifest)])
+
+    def add_many(self, items):
+        """Register (phash, manifest) pairs in one transaction."""
+        rows = [(h - (1 << 64) if h >= 1 << 63 else h, json.dumps(m)) for h, m in items]
+        with self._lock, self._db() as db:
+            self._version = None  # data_version only tracks other connections' commits
+            db.executemany("INSERT INTO phash (hash, manifest) VALUES (?, ?)", rows)
+
+    def _refresh(self):
+        """Pull rows committed since the last call (by any process); cheap when nothing changed."""
+        db = self._db()
+        version = db.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._version:
+            return
+        rows = db.execute("SELECT id, hash FROM phash WHERE id > ? ORDER BY id", (self._last_id,)).fetchall()
+        self._version = version
+        if not rows:
+            return
+        self._last_id = rows[-1][0]
+        self._tail_ids.extend(r[0] for r in rows)
+        self._tail_hashes.extend(r[1] for r in rows)
+        if len(self._tail_ids) >= self.rebuild_every or self._order is None:
+            self._rebuild()
+
+    def _rebuild(self):
+        ids = np.concatenate([self._ids, np.array(self._tail_ids, dtype=np.int64)])
+        hashes = np.concatenate([self._hashes, np.array(self._tail_hashes, dtype=np.int64).view(np.uint64)])
+        order, starts = [], []
+        for c in range(PHASH_CHUNKS):
+            chunk = ((hashes >> np.uint64(16 * c)) & np.uint64(0xFFFF)).astype(np.int64)
+            order.append(np.argsort(chunk, kind="stable").astype(np.uint32))
+            starts.append(np.concatenate(([0], np.cumsum(np.bincount(chunk, minlength=1 << 16)))))
+        self._ids, self._hashes, self._order, self._starts = ids, hashes, order, starts
+        self._tail_ids, self._tail_hashes = [], []
+
+    def lookup(self, phash: int, max_distance: int = PHASH_DISTANCE):
+        """(distance, manifest) of the nearest registered hash within max_distance, or None."""
+        with self._lock:
+            self._refresh()
+            query = np.uint64(phash)
+            best_id, best = None, max_distance + 1
+            if len(self._ids):
+                masks = _chunk_masks(max_distance // PHASH_CHUNKS)
+                parts = []
+                for c in range(PHASH_CHUNKS):
+                    probes = (int(phash >> (16 * c)) & 0xFFFF) ^ masks
+                    lo, hi = self._starts[c][probes], self._starts[c][probes + 1]
+                    parts += [self._order[c][a:b] for a, b in zip(lo[hi > lo], hi[hi > lo])]
+                if parts:
+                    cand = np.concatenate(parts)
+                    dist = _popcount64(self._hashes[cand] ^ query)
+                    i = int(dist.argmin())
+                    if dist[i] < best:
+                        best_id, best = int(self._ids[cand[i]]), int(dist[i])
+            if self._tail_ids:
+                dist = _popcount64(np.array(self._tail_hashes, dtype=np.int64).view(np.uint64) ^ query)
+                i = int(dist.argmin())
+                if dist[i] < best:
+                    best_id, best = self._tail_ids[i], int(dist[i])
+            if best_id is None:
+                return None
+            row = self._db().execute("SELECT manifest FROM phash WHERE id = ?", (best_id,)).fetchone()
+        return (best, json.loads(row[0])) if row else None
+
+def open_phash_index(index):
+    """PerceptualIndex for a path (one shared instance per path), an index, or None for ""/None."""
+    if not index or isinstance(index, PerceptualIndex):
+        return index or None
+    found = _phash_indexes.get(index)
+    if found is None:
+        found = _phash_indexes[index] = PerceptualIndex(index)
+    return found
+
+# ----- Images: embed + verify -----
+# PNG encode cost for embeds: a zlib level, or "smallest" for Pillow's optimize
+# search (slowest by far; encoding dominates embed time, not the watermark).
+PNG_COMPRESSION = {"none": 0, "fast": 1, "default": 6, "small": 9, "smallest": "optimize"}
+
+def _png_options(compression) -> dict:
+    level = PNG_COMPRESSION.get(compression, compression) if isinstance(compression, str) else compression
+    if level == "optimize":
+        return {"optimize": True}
+    if isinstance(level, bool) or not isinstance(level, int) or not 0 <= level <= 9:
+        raise ValueError(f"compression must be one of {', '.join(PNG_COMPRESSION)} or a zlib level 0-9")
+    return {"compress_level": level}
+
+def _open_image(src) -> Image.Image:
+    """PIL image as is; bytes-like objects, paths and file objects are opened (lazily decoded)."""
+    if isinstance(src, Image.Image):
+        return src
+    if isinstance(src, (bytes, bytearray, memoryview, mmap.mmap)):
+        return Image.open(io.BytesIO(src))
+    return Image.open(src)
+
+def _watermark(src: Image.Image, origin: str, region, ring_strength: float):
+    """
+    Ring + LSB-marked copy of `src` and its manifest. Images without alpha come
+    back as RGB, so the PNG encoder has a quarter less data (the tiled hash is
+    defined on RGBA and does not change).
+    """
+    keep_alpha = src.mode in ("RGBA", "LA", "PA") or "transparency" in src.info
+    img = src.convert("RGBA")
+    region = tuple(region)
+    ringed = _embed_ring(img, ring_strength)
+    digests = _tile_digests(img, region)
+    content_hash = _merkle_root(digests, img.size, HASH_TILE)
+    manifest = _build_manifest(origin, content_hash)
+    manifest["hash"] = {"alg": HASH_ALG, "tile": HASH_TILE, "size": list(img.size),
+                        "tiles": [d.hex()[:_HINT_HEX] for d in digests]}
+    if ringed:
+        manifest["ring"] = {"alg": RING_ALG, "size": RING_SIZE}
+    if region != LSB_REGION:
+        manifest["lsb_region"] = list(region)
+    _embed_lsb(img, _sig_pattern(manifest["sig"]), region)
+    return (img if keep_alpha else img.convert("RGB")), manifest
+
+def _save_png(img: Image.Image, manifest: dict, output, compression):
+    from PIL import PngImagePlugin
+    pnginfo = PngImagePlugin.PngInfo()
+    pnginfo.add_text(MANIFEST_KEY, json.dumps(manifest))
+    img.save(output, "PNG", pnginfo=pnginfo, **_png_options(compression))
 
+def embed_image_treering(image_path: str, output_path: str, origin: str = "Fake AI Generator",
+                         region=LSB_REGION, ring_strength: float = RING_STRENGTH, phash_index=PHASH_INDEX,
+                         compression="smallest") -> str:
+    """
+    Embed demo Tree-Ring watermark into PNG:
+     - add the key-derived frequency ring to the luminance (ring_strength=0 skips it)
+     - compute the tiled content hash of the pixels (LSB region excluded)
+     - build manifest (JSON) and store in PNG tEXt
+     - embed tiny LSB pattern in red channel of `region` (default top-left 32x32) as signal
+     - register the output's perceptual hash + manifest in `phash_index` (path or
+       PerceptualIndex; default REKE_PHASH_INDEX, empty = off)
+    `compression` is a PNG_COMPRESSION preset or zlib level ("fast" encodes an
+    order of magnitude faster than the default "smallest", for ~15% larger files).
+    Returns output_path. See embed_image for in-memory input/output.
+    """
+    img, manifest = _watermark(Image.open(image_path), origin, region, ring_strength)
     base, ext = os.path.splitext(output_path)
     if ext.lower() != ".png":
         output_path = base + ".reke.png"
-    img.save(output_path, "PNG", pnginfo=pnginfo, optimize=True)
+    _save_png(img, manifest, output_path, compression)
+    index = open_phash_index(phash_index)
+    if index is not None:
+        index.add(perceptual_hash(img), manifest)
     return output_path
 
-def verify_image_treering(image_bytes: bytes):
+def _embed_to(src, output, origin: str, region, ring_strength: float, compression):
+    """(PNG bytes or `output`, watermarked image, manifest)."""
+    img, manifest = _watermark(_open_image(src), origin, region, ring_strength)
+    dest = io.BytesIO() if output is None else output
+    _save_png(img, manifest, dest, compression)
+    return (dest.getvalue() if output is None else output), img, manifest
+
+def embed_image(image, output=None, origin: str = "Fake AI Generator", region=LSB_REGION,
+                ring_strength: float = RING_STRENGTH, compression="fast", phash_index=PHASH_INDEX):
     """
-    Verify demo Tree-Ring watermark:
-    Returns (status_string, manifest_or_none, sig_valid_bool)
-      status_string: "AI Generated" or "Real" or "Unknown"
+    embed_image_treering without temp files: `image` is a PIL image, bytes, a
+    path or a file object. Returns the watermarked PNG as bytes, or writes it
+    to `output` (path or binary file object) and returns `output`.
+    """
+    result, img, manifest = _embed_to(image, output, origin, region, ring_strength, compression)
+    index = open_phash_index(phash_index)
+    if index is not None:
+        index.add(perceptual_hash(img), manifest)
+    return result
+
+def embed_images(images, outputs=None, origin: str = "Fake AI Generator", region=LSB_REGION,
+                 ring_strength: float = RING_STRENGTH, compression="fast", phash_index=PHASH_INDEX,
+                 workers: int = None) -> list:
+    """
+    embed_image for many inputs on a thread pool (Pillow releases the GIL while
+    encoding). Key material (HMAC key, ring pattern) is set up once, and the
+    perceptual hashes are registered in one transaction. Returns PNG bytes per
+    input, or `outputs` (same length) after writing each image there.
     """
+    images = list(images)
+    outputs = [None] * len(images) if outputs is None else list(outputs)
+    if len(outputs) != len(images):
+        raise ValueError("outputs must match images")
+    _hmac_sig("")  # build the shared key state before the workers start
+    if ring_strength > 0:
+        _ring_pattern()
+    index = open_phash_index(phash_index)
+
+    def one(job):
+        result, img, manifest = _embed_to(*job, origin, region, ring_strength, compression)
+        return result, ((perceptual_hash(img), manifest) if index is not None else None)
+
+    # own pool: _tile_digests already fans out on the shared hash pool
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1, thread_name_prefix="reke-embed") as pool:
+        done = list(pool.map(one, zip(images, outputs)))
+    if index is not None:
+        index.add_many(entry for _, entry in done)
+    return [result for result, _ in done]
+
+def _signed(manifest) -> bool:
+    """A dict whose sig and content_hash are strings (anything else cannot be HMAC-checked)."""
+    return (isinstance(manifest, dict) and isinstance(manifest.get('sig'), str)
+            and isinstance(manifest.get('content_hash'), str))
+
+def _parse_manifest(mstr):
     try:
-        img = Image.open(io.BytesIO(image_bytes))
+        manifest = json.loads(mstr)
     except Exception:
-        return "Unknown", None, False
+        return None
+    return manifest if _signed(manifest) else None
 
-    manifest = None
-    sig_ok = False
-
-    # Prefer PNG tEXt manifest
-    if img.format == "PNG":
-        mstr = img.info.get("reke_manifest")
-        if mstr:
-            try:
-                manifest = json.loads(mstr)
-            except Exception:
-                manifest = None
-
-        if manifest and 'content_hash' in manifest and 'sig' in manifest:
-            expected_sig = _hmac_sig(manifest['content_hash'])
-            if expected_sig == manifest.get('sig'):
-                # extra LSB sanity check (demo)
-                px = img.convert('RGBA').load()
-                w, h = img.size
-                bits = []
-                for y in range(min(h, 32)):
-                    for x in range(min(w, 32)):
-                        r, g, b, a = px[x, y]
-                        bits.append(r & 1)
-                try:
-                    expected_first_bit = int(expected_sig[0], 16) & 1
-                    if bits and bits[0] == expected_first_bit:
-                        sig_ok = True
-                except Exception:
-                    sig_ok = False
+def _check_image_manifest(fmt: str, manifest: dict, load_region, timings=None,
+                          load_full=None, changed_tiles=None) -> bool:
+    """
+    Signature check shared by the header scanner and the PIL fallback.
+    PNG additionally runs the LSB sanity check; `load_region(region)` returns an
+    image covering at least that region. With `load_full` (strict mode) the
+    tiled content hash is recomputed from the full image it returns.
+    """
+    if not _signed(manifest):
+        return False
+    if fmt != "PNG":
+        with _stage(timings, "hmac"):
+            if manifest['sig'] != _hmac_sig(manifest['content_hash']):
+                return False
+        return load_full is None or _check_content_hash(manifest, load_full(), timings, changed_tiles)
+    with _stage(timings, "hmac"):
+        expected_sig = _hmac_sig(manifest['content_hash'])
+    if expected_sig != manifest.get('sig'):
+        return False
+    # extra LSB sanity check (demo)
+    region = _manifest_region(manifest)
+    try:
+        with _stage(timings, "decode"):
+            img = load_full() if load_full is not None else load_region(region)
+            if load_full is not None:
+                img.load()
+        with _stage(timings, "lsb_check"):
+            bits = _read_lsb(img, region)
+            # embed writes the pattern bytes' low bits, so compare against the first pattern byte
+            if not bits.size or bits.flat[0] != _sig_pattern(expected_sig)[0] & 1:
+                return False
+    except Exception:
+        return False
+    return load_full is None or _check_content_hash(manifest, img, timings, changed_tiles)
 
-    else:
-        # fallback: check comment with REKE_MANIFEST prefix (rare)
-        try:
+def _fallback_verdict(image, timings=None, rings=False, phash_index=None, phash_distance=PHASH_DISTANCE):
+    """
+    No valid manifest: look the image up in the perceptual index (recovering
+    the manifest it was embedded with), then try the frequency ring. Both use
+    one 128x128 luminance plane, decoded once. A pHash neighbour alone is not
+    evidence (unrelated images land within a few bits of some entry as the
+    index grows), so a hit only counts when the registered image's ring is
+    present too; otherwise it comes back as ("Real", {"possible_match": ...}, False).
+    """
+    index = open_phash_index(phash_index)
+    if not rings and index is None:
+        return "Real", None, False
+    try:
+        with _stage(timings, "decode"):
+            plane = _ring_plane(image)
+    except Exception:
+        return "Real", None, False
+    hit = None
+    if index is not None:
+        with _stage(timings, "phash"):
+            hit = index.lookup(_phash_plane(plane), phash_distance)
+        # only trust entries signed with the current secret
+        if not (hit and _signed(hit[1]) and hit[1]['sig'] == _hmac_sig(hit[1]['content_hash'])):
+            hit = None
+    if hit is None and not rings:
+        return "Real", None, False
+    with _stage(timings, "ring"):
+        detected = bool(ring_scores(plane[None])[0] >= RING_THRESHOLD)
+    if hit is not None:
+        distance, manifest = hit
+        match = {"alg": PHASH_ALG, "distance": distance}
+        if detected and "ring" in manifest:
+            return "AI Generated", dict(manifest, match=match), False
+    if detected and rings:
+        return "AI Generated", None, False
+    if hit is not None:
+        return "Real", {"possible_match": dict(match, manifest=manifest)}, False
+    return "Real", None, False
+
+def _verify_image_pil(image_bytes, timings=None, strict=False, changed_tiles=None, rings=False,
+                      phash_index=None, phash_distance=PHASH_DISTANCE):
+    """Fallback for containers the header scanner does not understand."""
+    try:
+        with _stage(timings, "decode"):
+            img = Image.open(io.BytesIO(image_bytes))
+    except Exception:
+        return "Unknown", None, False
+
+    with _stage(timings, "manifest_parse"):
+        if img.format == "PNG":
+            mstr = img.info.get(MANIFEST_KEY)
+            manifest = _parse_manifest(mstr) if mstr else None
+        else:
+            # fallback: check comment with REKE_MANIFEST prefix (rare)
             comment = img.info.get('comment', '')
-            if comment and comment.startswith('REKE_MANIFEST:'):
-                manifest = json.loads(comment.split('REKE_MANIFEST:', 1)[1])
-                sig_ok = (manifest.get('sig') == _hmac_sig(manifest.get('content_hash', '')))
-        except Exception:
+            if isinstance(comment, bytes):
+                comment = comment.decode("utf-8", "replace")
             manifest = None
-            sig_ok = False
+            if comment and comment.startswith(MANIFEST_PREFIX):
+                manifest = _parse_manifest(comment[len(MANIFEST_PREFIX):])
 
-    if manifest and sig_ok:
+    load_full = (lambda: img) if strict else None
+    if manifest and _check_image_manifest(img.format, manifest, lambda region: img, timings, load_full, changed_tiles):
         return "AI Generated", manifest, True
-    else:
-        # no valid manifest -> Real (for demo)
-        return "Real", None, False
+    return _fallback_verdict(img, timings, rings, phash_index, phash_distance)
+
+def verify_image_treering(image_bytes, timings: dict = None, strict: bool = False, changed_tiles: list = None,
+                          rings: bool = False, phash_index=PHASH_INDEX, phash_distance: int = PHASH_DISTANCE):
+    """
+    Verify demo Tree-Ring watermark:
+    Returns (status_string, manifest_or_none, sig_valid_bool)
+      status_string: "AI Generated" or "Real" or "Unknown"
+    `image_bytes` may be bytes, a memoryview/mmap, a path or a file object.
+    PNG/JPEG/WebP are answered from the container headers; pixels are only
+    decoded (top rows of a PNG) once a manifest with a valid HMAC is found.
+    Pass a dict as `timings` to collect per-stage seconds
+    (manifest_parse, hmac, decode, lsb_check, content_hash).
+    strict=True also decodes the whole image and recomputes the tiled content
+    hash, so a manifest copied onto other pixels fails; pass a list as
+    `changed_tiles` to receive the (x, y, w, h) tiles that no longer match.
+    rings=True runs the frequency ring detector when no valid manifest is found,
+    so re-encoded or resized images whose metadata was stripped are still
+    reported as "AI Generated" (with no manifest and sig_valid False).
+    With a perceptual index (`phash_index`, default REKE_PHASH_INDEX) an image
+    without a valid manifest is matched against registered embeds within
+    `phash_distance` bits. A hit whose ring is also detected returns the
+    registered manifest plus manifest["match"] = {"alg", "distance"}, with
+    sig_valid False; an unconfirmed hit stays "Real" and is returned as
+    {"possible_match": {"alg", "distance", "manifest"}} in place of the manifest.
+    """
+    image_bytes = _as_buffer(image_bytes)
+    with _stage(timings, "manifest_parse"):
+        scan = _scan_manifest(image_bytes)
+        if scan is not None:
+            fmt, mstr = scan
+            manifest = _parse_manifest(mstr) if mstr else None
+    if scan is None:
+        return _verify_image_pil(image_bytes, timings, strict, changed_tiles, rings, phash_index, phash_distance)
+
+    if manifest:
+        load_region = lambda region: _png_top_rows(image_bytes, max(region[1], 0) + max(region[3], 0))
+        load_full = (lambda: Image.open(io.BytesIO(image_bytes))) if strict else None
+        if _check_image_manifest(fmt, manifest, load_region, timings, load_full, changed_tiles):
+            return "AI Generated", manifest, True
+    # no valid manifest -> Real (for demo), unless the ring detector finds the mark
+    return _fallback_verdict(image_bytes, timings, rings, phash_index, phash_distance)
+
+
+# ----- Warm-up -----
+def warm_up(phash_index=PHASH_INDEX, size: int = 256) -> float:
+    """
+    Prime what the first verification would otherwise pay for: the PNG and JPEG
+    codecs only (other PIL plugins still load on demand), the HMAC key and ring
+    key/pattern, the DCT matrix and `phash_index`. Runs one in-memory embed and
+    strict + ring verifies; returns the seconds it took.
+    """
+    t0 = time.perf_counter()
+    from PIL import JpegImagePlugin, PngImagePlugin  # registers just these two formats
+    open_phash_index(phash_index)
+    img = Image.new("RGB", (size, size), (128, 128, 128))
+    marked = embed_image(img, compression="fast", phash_index=None)
+    plain = io.BytesIO()
+    img.save(plain, "JPEG", quality=90)
+    for data in (marked, plain.getvalue()):
+        verify_image_treering(data, strict=True, rings=True, phash_index=phash_index)
+    perceptual_hash(img)
+    return time.perf_counter() - t0
 
 # ----- Video hybrid (optional demo) -----
-def embed_video_hybrid(video_path: str, output_path: str, origin: str = "Fake AI Generator") -> str:
+# Encoder settings for embed_video_hybrid: lossless RGB so the frame LSB mark survives.
+VIDEO_ENCODE_ARGS = ("-c:v", "libx264rgb", "-qp", "0", "-preset", "veryfast", "-pix_fmt", "rgb24")
+
+def _file_sha256(path: str, chunk: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _probe_video_stream(video_path: str):
+    """Return (width, height, frame_rate_str) of the first video stream via ffprobe."""
+    import subprocess
+    cmd = [FFPROBE, "-v", "error", "-select_streams", "v:0", "-show_entries",
+           "stream=width,height,r_frame_rate", "-of", "json", video_path]
+    p = subprocess.run(cmd, capture_output=True, text=True)
+    streams = json.loads(p.stdout or "{}").get("streams") if p.returncode == 0 else None
+    if not streams:
+        raise RuntimeError('ffprobe found no video stream')
+    st = streams[0]
+    return int(st["width"]), int(st["height"]), st.get("r_frame_rate") or "25/1"
+
+def _read_frame(stream, size: int):
+    """Read exactly one raw frame into a fresh bytearray; None at end of stream."""
+    buf = bytearray(size)
+    view, got = memoryview(buf), 0
+    while got < size:
+        n = stream.readinto(view[got:])
+        if not n:
+            return None
+        got += n
+    return buf
+
+def _ready(value) -> Future:
+    fut = Future()
+    fut.set_result(value)
+    return fut
+
+def _mark_frame(frame: bytearray, width: int, height: int, pattern: bytes, region=LSB_REGION,
+                ring=None) -> bytearray:
+    """Add the ring offsets (if any) and, when `pattern` is given, the LSB tile to one RGBA frame."""
+    arr = np.frombuffer(frame, dtype=np.uint8).reshape(height, width, 4)
+    if ring is not None:
+        rgb = arr[..., :3]
+        rgb[...] = np.clip(rgb + ring[..., None], 0, 255)
+    x0, y0, x1, y1 = _lsb_box((width, height), region)
+    if pattern and x1 > x0 and y1 > y0:
+        _write_lsb(arr[y0:y1, x0:x1], pattern)
+    return frame
+
+def embed_video_hybrid(video_path: str, output_path: str, origin: str = "Fake AI Generator",
+                       every: int = 10, workers: int = None, encode_args=VIDEO_ENCODE_ARGS,
+                       ring_strength: float = RING_STRENGTH) -> str:
     """
     Demo video watermark:
-     - compute content hash for full file
-     - extract key frames, apply embed_image_treering on frames
-     - write manifest into metadata comment (ffmpeg)
-    Requires ffmpeg binary in PATH.
-    """
-    with open(video_path, 'rb') as f:
-        vbytes = f.read()
-    content_hash = _content_hash_bytes(vbytes)
+     - compute content hash for full file (streamed)
+     - decode raw RGBA frames from ffmpeg on a worker pool: add the frequency ring
+       to every frame (ring_strength=0 skips it) and LSB-mark every `every`-th frame
+     - re-encode the marked frames (audio copied) with the manifest in the metadata comment
+    Requires ffmpeg and ffprobe binaries in PATH.
+    """
+    import subprocess
+    content_hash = _file_sha256(video_path)
     manifest = _build_manifest(origin, content_hash)
+    pattern = _sig_pattern(manifest['sig'])
+    width, height, rate = _probe_video_stream(video_path)
+    frame_size = width * height * 4
+    ring = _ring_delta(width, height, ring_strength)
+    if ring is not None:
+        manifest["ring"] = {"alg": RING_ALG, "size": RING_SIZE}
 
-    with tempfile.TemporaryDirectory() as tmp:
-        frames_pattern = os.path.join(tmp, 'frame_%06d.png')
-        cmd_extract = f'ffmpeg -y -i "{video_path}" -vf "select=not(mod(n\\,10))" -vsync vfr "{frames_pattern}"'
-        subprocess.call(cmd_extract, shell=True)
-        # re-embed on extracted frames
-        for fn in sorted(os.listdir(tmp)):
-            if fn.startswith('frame_') and fn.endswith('.png'):
-                fp = os.path.join(tmp, fn)
-                try:
-                    embed_image_treering(fp, fp, origin=origin)
-                except Exception:
-                    pass
-        manifest_json = json.dumps(manifest).replace('"', '\\"')
-        cmd_meta = f'ffmpeg -y -i "{video_path}" -metadata comment="{manifest_json}" -c copy "{output_path}"'
-        code = subprocess.call(cmd_meta, shell=True)
-        if code != 0:
-            raise RuntimeError('ffmpeg failed to write metadata')
+    decode = [FFMPEG, "-v", "error", "-i", video_path, "-map", "0:v:0", "-f", "rawvideo", "-pix_fmt", "rgba", "pipe:1"]
+    encode = [FFMPEG, "-v", "error", "-y", "-f", "rawvideo", "-pix_fmt", "rgba", "-s", f"{width}x{height}",
+              "-r", rate, "-i", "pipe:0", "-i", video_path, "-map", "0:v:0", "-map", "1:a?", "-c:a", "copy",
+              *encode_args, "-metadata", "comment=" + json.dumps(manifest), output_path]
+    workers = workers or os.cpu_count() or 1
+    dec = subprocess.Popen(decode, stdout=subprocess.PIPE, bufsize=frame_size)
+    enc = subprocess.Popen(encode, stdin=subprocess.PIPE)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending, index = deque(), 0
+            while True:
+                frame = _read_frame(dec.stdout, frame_size)
+                if frame is None:
+                    break
+                lsb = pattern if index % every == 0 else None
+                if lsb or ring is not None:
+                    pending.append(pool.submit(_mark_frame, frame, width, height, lsb, LSB_REGION, ring))
+                else:
+                    pending.append(_ready(frame))
+                index += 1
+                # write in frame order; bound the frames held in memory
+                while pending and (len(pending) > 2 * workers or pending[0].done()):
+                    enc.stdin.write(pending.popleft().result())
+            while pending:
+                enc.stdin.write(pending.popleft().result())
+    except BrokenPipeError:
+        pass  # encoder exited early; reported through its exit code below
+    finally:
+        for stream in (enc.stdin, dec.stdout):
+            try: stream.close()
+            except OSError: pass
+        dec_code, enc_code = dec.wait(), enc.wait()
+    if dec_code != 0 or enc_code != 0:
+        raise RuntimeError('ffmpeg failed to re-encode the watermarked video')
     return output_path
 
-def verify_video_hybrid(video_path: str):
+# ----- Container metadata (MP4/MOV, Matroska/WebM) -----
+_MP4_TOP_LEVEL = {b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pnot"}
+_MP4_COMMENT = b"\xa9cmt"
+
+def _mp4_boxes(buf, start: int, end: int):
+    """Yield (type, payload_start, box_end) for each box in buf[start:end]."""
+    pos = start
+    while pos + 8 <= end:
+        size = int.from_bytes(buf[pos:pos + 4], "big")
+        btype = bytes(buf[pos + 4:pos + 8])
+        header = 8
+        if size == 1:  # 64-bit largesize
+            size = int.from_bytes(buf[pos + 8:pos + 16], "big")
+            header = 16
+        elif size == 0:  # box runs to the end of its parent
+            size = end - pos
+        if size < header or pos + size > end:
+            raise ValueError("bad MP4 box size")
+        yield btype, pos + header, pos + size
+        pos += size
+
+def _mp4_child(buf, start: int, end: int, btype: bytes):
+    for t, s, e in _mp4_boxes(buf, start, end):
+        if t == btype:
+            return s, e
+    return None
+
+def _mp4_data_text(buf, start: int, end: int) -> str:
+    # iTunes-style value: 'data' box holding type + locale, then the UTF-8 text
+    data = _mp4_child(buf, start, end, b"data")
+    return bytes(buf[data[0] + 8:data[1]]).decode("utf-8", "replace") if data else ""
+
+def _mp4_comment(buf) -> str:
+    """Comment from moov/udta: QuickTime '©cmt' or iTunes meta/ilst/'©cmt'."""
+    moov = _mp4_child(buf, 0, len(buf), b"moov")
+    if moov is None:
+        raise ValueError("no moov box")
+    udta = _mp4_child(buf, *moov, b"udta")
+    if udta is None:
+        return ""
+    for t, s, e in _mp4_boxes(buf, *udta):
+        if t == _MP4_COMMENT:
+            if bytes(buf[s + 4:s + 8]) == b"data":
+                return _mp4_data_text(buf, s, e)
+            # QuickTime user data text: 16-bit length, 16-bit language, text
+            length = int.from_bytes(buf[s:s + 2], "big")
+            return bytes(buf[s + 4:min(e, s + 4 + length)]).decode("utf-8", "replace")
+        if t == b"meta":
+            if bytes(buf[s + 4:s + 8]) != b"hdlr":
+                s += 4  # ISO full box: skip version/flags
+            ilst = _mp4_child(buf, s, e, b"ilst")
+            cmt = ilst and _mp4_child(buf, *ilst, _MP4_COMMENT)
+            if cmt:
+                return _mp4_data_text(buf, *cmt)
+    return ""
+
+_EBML_MAGIC = b"\x1a\x45\xdf\xa3"
+_MKV_SEGMENT, _MKV_SEEKHEAD, _MKV_SEEK, _MKV_SEEK_ID, _MKV_SEEK_POS = 0x18538067, 0x114D9B74, 0x4DBB, 0x53AB, 0x53AC
+_MKV_TAGS, _MKV_TAG, _MKV_SIMPLE_TAG, _MKV_TAG_NAME, _MKV_TAG_STRING = 0x1254C367, 0x7373, 0x67C8, 0x45A3, 0x4487
+
+def _ebml_vint(buf, pos: int, keep_marker: bool):
+    first = buf[pos]
+    if first == 0:
+        raise ValueError("bad EBML vint")
+    length = 9 - first.bit_length()
+    value = first if keep_marker else first & ((1 << (8 - length)) - 1)
+    for b in bytes(buf[pos + 1:pos + length]):
+        value = (value << 8) | b
+    return value, length
+
+def _ebml_elements(buf, start: int, end: int):
+    """Yield (id, data_start, data_end) for each element in buf[start:end]; unknown sizes run to `end`."""
+    pos = start
+    while pos < end:
+        eid, n = _ebml_vint(buf, pos, True)
+        size, m = _ebml_vint(buf, pos + n, False)
+        data = pos + n + m
+        stop = end if size == (1 << (7 * m)) - 1 else data + size
+        if stop > end:
+            raise ValueError("bad EBML element size")
+        yield eid, data, stop
+        pos = stop
+
+def _mkv_tags_comment(buf, start: int, end: int) -> str:
+    for eid, s, e in _ebml_elements(buf, start, end):
+        if eid != _MKV_TAG:
+            continue
+        for sid, ss, se in _ebml_elements(buf, s, e):
+            if sid != _MKV_SIMPLE_TAG:
+                continue
+            fields = {fid: bytes(buf[fs:fe]) for fid, fs, fe in _ebml_elements(buf, ss, se)}
+            if fields.get(_MKV_TAG_NAME, b"").upper() == b"COMMENT":
+                return fields.get(_MKV_TAG_STRING, b"").decode("utf-8", "replace")
+    return ""
+
+def _mkv_seek_position(buf, start: int, end: int, target: int):
+    for eid, s, e in _ebml_elements(buf, start, end):
+        if eid == _MKV_SEEK:
+            fields = {fid: bytes(buf[fs:fe]) for fid, fs, fe in _ebml_elements(buf, s, e)}
+            if int.from_bytes(fields.get(_MKV_SEEK_ID, b""), "big") == target:
+                return int.from_bytes(fields.get(_MKV_SEEK_POS, b""), "big")
+    return None
+
+def _mkv_comment(buf) -> str:
+    """COMMENT SimpleTag from the Segment's Tags, jumping there via the SeekHead when possible."""
+    segment = next(((s, e) for eid, s, e in _ebml_elements(buf, 0, len(buf)) if eid == _MKV_SEGMENT), None)
+    if segment is None:
+        raise ValueError("no Segment")
+    seg_start, seg_end = segment
+    for eid, s, e in _ebml_elements(buf, seg_start, seg_end):
+        if eid == _MKV_TAGS:
+            return _mkv_tags_comment(buf, s, e)
+        if eid == _MKV_SEEKHEAD:
+            pos = _mkv_seek_position(buf, s, e, _MKV_TAGS)
+            if pos is not None:
+                eid, s, e = next(_ebml_elements(buf, seg_start + pos, seg_end))
+                if eid != _MKV_TAGS:
+                    raise ValueError("SeekHead does not point at Tags")
+                return _mkv_tags_comment(buf, s, e)
+    return ""
+
+def read_video_comment(src):
     """
-    Read ffprobe metadata comment and check signature.
+    Read the container `comment` tag in-process, touching only header bytes:
+    MP4/MOV (moov/udta, meta/ilst) and Matroska/WebM (Tags). `src` may be a
+    path, file object, mmap or bytes. Returns the comment ('' when there is
+    none) or None when the container is not recognised or looks malformed.
     """
-    cmd = f'ffprobe -v quiet -print_format json -show_format "{video_path}"'
-    p = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-    if p.returncode != 0 or not p.stdout:
-        return "Unknown", None, False
+    buf = memoryview(_as_buffer(src))
     try:
-        info = json.loads(p.stdout)
-    except Exception:
-        return "Unknown", None, False
-    comment = info.get('format', {}).get('tags', {}).get('comment', '')
+        if bytes(buf[:4]) == _EBML_MAGIC:
+            return _mkv_comment(buf)
+        if bytes(buf[4:8]) in _MP4_TOP_LEVEL:
+            return _mp4_comment(buf)
+    except (ValueError, IndexError, StopIteration):
+        return None
+    return None
+
+def _ffprobe_cmd(video_path: str) -> list:
+    return [FFPROBE, "-v", "quiet", "-print_format", "json", "-show_format", video_path]
+
+def _comment_verdict(comment: str, timings=None):
+    """Turn a container comment into (status, manifest, sig_ok)."""
     if not comment:
         return "Real", None, False
     try:
-        manifest = json.loads(comment)
+        with _stage(timings, "manifest_parse"):
+            manifest = json.loads(comment)
     except Exception:
         return "Unknown", None, False
-    sig_ok = (manifest.get('sig') == _hmac_sig(manifest.get('content_hash', '')))
-    if manifest and sig_ok:
+    if not _signed(manifest):
+        return "Real", None, False
+    with _stage(timings, "hmac"):
+        sig_ok = manifest['sig'] == _hmac_sig(manifest['content_hash'])
+    if sig_ok:
         return "AI Generated", manifest, True
     else:
         return "Real", None, False
+
+def _video_verdict(returncode: int, stdout: str, timings=None):
+    """Turn ffprobe's JSON output into (status, manifest, sig_ok)."""
+    if returncode != 0 or not stdout:
+        return "Unknown", None, False
+    try:
+        info = json.loads(stdout)
+    except Exception:
+        return "Unknown", None, False
+    return _comment_verdict(info.get('format', {}).get('tags', {}).get('comment', ''), timings)
+
+# ----- Frame sampling (video) -----
+# Sampled frames come out of ffmpeg already scaled to the ring detector's
+# RING_SIZE x RING_SIZE grey plane, so per-frame cost does not depend on the
+# resolution and no image files are written.
+FRAME_STRIDE = 15       # check every Nth decoded frame
+FRAME_MAX = 24          # frames checked at most
+FRAME_SECONDS = 5.0     # wall-clock budget; ffmpeg is killed when it runs out
+
+def _frame_sample_cmd(path: str, stride: int, max_frames: int, keyframes: bool) -> list:
+    vf = f"select=not(mod(n\\,{max(1, stride)})),scale={RING_SIZE}:{RING_SIZE}:flags=area,format=gray"
+    cmd = [FFMPEG, "-v", "error", "-nostdin"]
+    if keyframes:
+        cmd += ["-skip_frame", "nokey"]  # decode keyframes only: cheapest, stride then counts keyframes
+    return cmd + ["-i", path, "-map", "0:v:0", "-an", "-sn", "-dn", "-vf", vf, "-vsync", "0",
+                  "-frames:v", str(max(1, max_frames)), "-f", "rawvideo", "-pix_fmt", "gray", "pipe:1"]
+
+def verify_video_frames(video_path, stride: int = FRAME_STRIDE, max_frames: int = FRAME_MAX,
+                        max_seconds: float = FRAME_SECONDS, keyframes: bool = False,
+                        threshold: float = RING_THRESHOLD, timings: dict = None):
+    """
+    Frame-level check that does not depend on container metadata: run the ring
+    detector on every `stride`-th frame, stopping at the first hit or after
+    `max_frames` frames / `max_seconds` seconds.
+    Returns (status_string, None, False) like the other verifiers; "Unknown"
+    when ffmpeg is missing or no frame could be decoded.
+    `timings` collects frame_decode and ring seconds.
+    """
+    import subprocess
+    size = RING_SIZE * RING_SIZE
+    seen, hit = 0, False
+    with _video_path(video_path) as path:
+        try:
+            proc = subprocess.Popen(_frame_sample_cmd(path, stride, max_frames, keyframes),
+                                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=size)
+        except OSError:  # ffmpeg not installed
+            return "Unknown", None, False
+        budget = threading.Timer(max_seconds, proc.kill)  # unblocks the read below
+        budget.start()
+        try:
+            while not hit:
+                with _stage(timings, "frame_decode"):
+                    frame = _read_frame(proc.stdout, size)
+                if frame is None:
+                    break
+                seen += 1
+                with _stage(timings, "ring"):
+                    plane = np.frombuffer(frame, dtype=np.uint8).reshape(1, RING_SIZE, RING_SIZE)
+                    hit = bool(ring_scores(plane)[0] >= threshold)
+        finally:
+            budget.cancel()
+            proc.stdout.close()
+            if proc.poll() is None:
+                proc.kill()
+            proc.wait()
+    if hit:
+        return "AI Generated", None, False
+    return ("Real", None, False) if seen else ("Unknown", None, False)
+
+def _frames_fallback(verdict, frame_verdict):
+    # frames only upgrade the metadata verdict; a decodable video is never "Unknown"
+    if frame_verdict[0] == "AI Generated" or verdict[0] == "Unknown":
+        return frame_verdict
+    return verdict
+
+def verify_video_hybrid(video_path, timings: dict = None, frames: bool = False, **frame_options):
+    """
+    Read the container metadata comment and check signature.
+    MP4/MOV/Matroska are parsed in-process; other containers fall back to ffprobe.
+    `video_path` may also be bytes, a memoryview/mmap or a file object; it is
+    written to a temp file at most once, when ffprobe or frame sampling needs a path.
+    `timings` collects per-stage seconds (container_read, ffprobe, manifest_parse, hmac).
+    frames=True also runs verify_video_frames (with `frame_options`) when the
+    metadata does not prove AI origin, so remuxes that drop tags are caught.
+    """
+    verdict = _container_verdict(video_path, timings)
+    if verdict is not None and not _needs_frames(verdict, frames):
+        return verdict
+    with _video_path(video_path) as path:
+        if verdict is None:
+            verdict = _ffprobe_verdict(path, timings)
+        if _needs_frames(verdict, frames):
+            verdict = _frames_fallback(verdict, verify_video_frames(path, timings=timings, **frame_options))
+    return verdict
+
+def _container_verdict(video_path, timings=None):
+    """Verdict from the in-process container parser, or None when ffprobe has to look."""
+    with _stage(timings, "container_read"):
+        comment = read_video_comment(video_path)
+    return None if comment is None else _comment_verdict(comment, timings)
+
+def _needs_frames(verdict, frames: bool) -> bool:
+    return frames and verdict[0] != "AI Generated"
+
+def _ffprobe_verdict(path: str, timings=None):
+    import subprocess
+    with _stage(timings, "ffprobe"):
+        try:
+            p = subprocess.run(_ffprobe_cmd(path), capture_output=True, text=True)
+        except OSError:  # ffprobe not installed
+            return "Unknown", None, False
+    return _video_verdict(p.returncode, p.stdout, timings)
+
+async def verify_video_hybrid_async(video_path, timings: dict = None, frames: bool = False, **frame_options):
+    """
+    Same as verify_video_hybrid; the ffprobe fallback runs as an asyncio
+    subprocess so the event loop keeps serving other requests while it probes,
+    and the temp-file spill and frame sampling run in worker threads.
+    """
+    import asyncio
+    verdict = _container_verdict(video_path, timings)
+    if verdict is not None and not _needs_frames(verdict, frames):
+        return verdict
+    async with _video_path_async(video_path) as path:
+        if verdict is None:
+            verdict = await _ffprobe_verdict_async(path, timings)
+        if _needs_frames(verdict, frames):
+            frame_verdict = await asyncio.to_thread(verify_video_frames, path, timings=timings, **frame_options)
+            verdict = _frames_fallback(verdict, frame_verdict)
+    return verdict
+
+async def _ffprobe_verdict_async(path: str, timings=None):
+    import asyncio
+    with _stage(timings, "ffprobe"):
+        try:
+            proc = await asyncio.create_subprocess_exec(*_ffprobe_cmd(path), stdout=asyncio.subprocess.PIPE,
+                                                        stderr=asyncio.subprocess.DEVNULL)
+        except OSError:  # ffprobe not installed
+            return "Unknown", None, False
+        stdout, _ = await proc.communicate()
+    return _video_verdict(proc.returncode, stdout.decode(errors="replace"), timings)
@@ -0,0 +1,196 @@
+# platform_api/telemetry.py
+# Counters and fixed-bucket latency histograms for the verify path, exported
+# in the Prometheus text format next to the JSON /metrics.
+# Values live in an anonymous shared mmap created at import, so when the app
+# is preloaded and forked (gunicorn.conf.py) every worker updates the same
+# segment and any worker can serve the totals. Each process writes only its
+# own slot, so updates take no cross-process lock; reads sum the slots.
+import os, json, mmap, bisect, logging, threading, multiprocessing
+import numpy as np
+
+# seconds; the +Inf bucket is implied
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# shared segment: worker slots x registered series x (bucket counts..., +Inf count, sum)
+# restarted workers reuse dead slots, so twice the worker count leaves room for the master and stragglers
+SHM_SLOTS = int(os.getenv("REKE_METRICS_SLOTS", str(max(64, 2 * int(os.getenv("REKE_WORKERS", "1"))))))
+SHM_SERIES = int(os.getenv("REKE_METRICS_SERIES", "1024"))
+_KEY_BYTES = 128
+
+slow_log = logging.getLogger("reke.slow")
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class SharedStore:
+    """
+    Fixed-size table of float64 rows in shared memory, one slot per process.
+    Series are registered once (append-only, under a process lock) and then
+    addressed by row; a restarted worker takes over a dead worker's slot, so
+    totals never go backwards. A process that finds every slot taken by a live
+    one counts into a private slot instead (reported only by itself).
+    """
+    def __init__(self, slots: int = SHM_SLOTS, max_series: int = SHM_SERIES, width: int = len(LATENCY_BUCKETS) + 2):
+        self.slots, self.max_series, self.width = max(1, slots), max(1, max_series), width
+        self._keys_at = 8 * self.slots + 8
+        head = -(-(self._keys_at + self.max_series * _KEY_BYTES) // 8) * 8
+        self._mm = mmap.mmap(-1, head + 8 * self.slots * self.max_series * width)  # MAP_SHARED | MAP_ANONYMOUS
+        self._pids = np.frombuffer(self._mm, dtype=np.int64, count=self.slots)
+        self._count = np.frombuffer(self._mm, dtype=np.int64, count=1, offset=8 * self.slots)
+        self._data = np.frombuffer(self._mm, dtype=np.float64, offset=head).reshape(self.slots, self.max_series, width)
+        self._plock = multiprocessing.Lock()  # slot claims and series registration only
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._pid = self._slot = self._private = None
+        self._rows, self._known = {}, 0
+
+    def _claim(self) -> np.ndarray:
+        """This process's (series x width) table: its shared slot, or a private one when all are live."""
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._plock:
+                pids = [int(p) for p in self._pids]
+                free = [i for i, p in enumerate(pids) if p in (0, pid)] or [i for i, p in enumerate(pids) if not _alive(p)]
+                if free:
+                    self._pids[free[0]] = pid
+            if free:
+                self._slot = self._data[free[0]]
+            else:
+                logging.getLogger("reke").warning("all %d metrics slots are held by live processes; pid %d keeps its "
+                                                  "metrics private (raise REKE_METRICS_SLOTS)", self.slots, pid)
+                self._slot = self._private = np.zeros((self.max_series, self.width))
+            self._pid = pid
+        return self._slot
+
+    def _sync_keys(self):
+        for row in range(self._known, int(self._count[0])):
+            off = self._keys_at + row * _KEY_BYTES
+            self._rows[bytes(self._mm[off:off + _KEY_BYTES]).rstrip(b"\0").decode()] = row
+        self._known = int(self._count[0])
+
+    def row(self, key: str) -> int:
+        """Row of `key`, registering it on first use (-1, i.e. dropped, when the table is full or the key too long)."""
+        row = self._rows.get(key)
+        if row is None:
+            raw = key.encode()
+            if len(raw) > _KEY_BYTES:
+                return -1
+            with self._plock:
+                self._sync_keys()
+                row = self._rows.get(key)
+                if row is None:
+                    row = int(self._count[0])
+                    if row >= self.max_series:
+                        return -1
+                    off = self._keys_at + row * _KEY_BYTES
+                    self._mm[off:off + _KEY_BYTES] = raw.ljust(_KEY_BYTES, b"\0")
+                    self._count[0] = row + 1
+                    self._rows[key], self._known = row, row + 1
+        return row
+
+    def add(self, key: str, value: float):
+        """Add `value` to the first column of `key` in this process's slot (counters)."""
+        row, table = self.row(key), self._claim()
+        if row >= 0:
+            with self._lock:
+                table[row, 0] += value
+
+    def observe(self, key: str, buckets, value: float):
+        row, table = self.row(key), self._claim()
+        if row >= 0:
+            with self._lock:
+                series = table[row]
+                series[bisect.bisect_left(buckets, value):len(buckets) + 1] += 1  # every bucket with value <= bound
+                series[-1] += value
+
+    def read(self, prefix: str) -> dict:
+        """Summed rows of every key starting with `prefix`, across all slots."""
+        self._sync_keys()
+        rows = {key: row for key, row in self._rows.items() if key.startswith(prefix)}
+        if not rows:
+            return {}
+        totals = self._data[:, sorted(rows.values())].sum(axis=0)
+        if self._private is not None:
+            totals += self._private[sorted(rows.values())]
+        return {key: totals[i] for i, (key, _) in enumerate(sorted(rows.items(), key=lambda kv: kv[1]))}
+
+    def workers(self) -> int:
+        return sum(1 for p in self._pids if p and _alive(int(p)))
+
+STORE = SharedStore()
+
+class Counter:
+    """Monotonic counter shared by every worker process."""
+    def __init__(self, name: str, store: SharedStore = None):
+        self.name, self.store = name, store or STORE
+        self._key = f"c:{name}"
+
+    def inc(self, value: float = 1):
+        self.store.add(self._key, value)
+
+    @property
+    def value(self) -> int:
+        total = self.store.read(self._key).get(self._key)
+        return 0 if total is None else int(total[0])
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+    def __init__(self, name: str, help_text: str, label_names, buckets=LATENCY_BUCKETS, store: SharedStore = None):
+        self.name, self.help, self.label_names, self.buckets = name, help_text, tuple(label_names), tuple(buckets)
+        self.store = store or STORE
+        if len(self.buckets) + 2 > self.store.width:
+            raise ValueError(f"{name}: {len(self.buckets)} buckets do not fit the shared store")
+        self._prefix = f"h:{name}:"
+        self._keys = {}  # labels -> store key
+
+    def observe(self, labels, value: float):
+        labels = tuple(labels)
+        key = self._keys.get(labels)
+        if key is None:
+            key = self._keys[labels] = self._prefix + json.dumps(labels, separators=(",", ":"))
+        self.store.observe(key, self.buckets, value)
+
+    def snapshot(self) -> dict:
+        """labels -> [bucket counts..., +Inf count, sum], summed over workers."""
+        n = len(self.buckets) + 1
+        return {tuple(json.loads(key[len(self._prefix):])): [int(c) for c in row[:n]] + [float(row[-1])]
+                for key, row in self.store.read(self._prefix).items()}
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.snapshot().items()):
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            sep = "," if base else ""
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound:g}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {series[len(self.buckets)]}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{{{base}}} {series[len(self.buckets)]}")
+        return lines
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+STAGE_SECONDS = Histogram("reke_verify_stage_seconds", "Time spent per verification stage.",
+                          ("stage", "media", "result"))
+
+def observe_verification(media: str, result: str, timings: dict, slow_seconds: float = 0.0, **context):
+    """Record every stage in `timings` (plus 'total') and log the breakdown when total exceeds slow_seconds."""
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.observe((stage, media, result), seconds)
+    total = timings.get("total", 0.0)
+    if slow_seconds and total >= slow_seconds:
+        slow_log.warning("slow verification %s", json.dumps(dict(context, media=media, result=result,
+                                                                  stages_ms={k: round(v * 1000, 3) for k, v in timings.items()})))
+
+def render_counter(name: str, help_text: str, value, kind: str = "counter") -> list:
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
@@ -0,0 +1,105 @@
+# platform_api/verify_cache.py
+# Content-addressed cache of verification results (demo).
+# Keys are (media kind, SHA-256 of the uploaded bytes). Entries live in an
+# in-memory LRU with a TTL and, optionally, in a SQLite file that survives
+# restarts. Everything is dropped when REKE_SECRET (or the verify variant,
+# e.g. strict mode) changes. Hit/miss counters are shared by all workers;
+# each worker keeps its own memory tier and SQLite connection.
+import os, json, time, hashlib, sqlite3, threading
+from collections import OrderedDict
+from sdk import reke_sdk
+from telemetry import Counter
+
+class VerifyCache:
+    def __init__(self, max_entries: int = 10000, ttl: float = 3600.0, path: str = "", variant: str = ""):
+        self.variant = variant
+        self.max_entries, self.ttl = max(1, max_entries), ttl
+        self._hits, self._misses, self._disk_hits, self._evictions = (
+            Counter(f"cache_{name}") for name in ("hits", "misses", "disk_hits", "evictions"))
+        self._mem = OrderedDict()  # key -> (expires_at, result)
+        self._lock = threading.Lock()
+        self._secret = reke_sdk.REKE_SECRET
+        self.path = path
+        self._conn, self._conn_pid = None, None
+        if path:
+            db = self._connect()
+            db.execute("CREATE TABLE IF NOT EXISTS verify_cache ("
+                       "key TEXT PRIMARY KEY, secret TEXT NOT NULL, result TEXT NOT NULL, expires REAL NOT NULL)")
+            db.execute("DELETE FROM verify_cache WHERE secret != ? OR expires < ?", (self._fingerprint(), time.time()))
+            db.close()  # connections must not cross a fork: each process opens its own in _db
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    @property
+    def _db(self):
+        if not self.path:
+            return None
+        if self._conn_pid != os.getpid():
+            self._conn, self._conn_pid = self._connect(), os.getpid()
+        return self._conn
+
+    def _fingerprint(self) -> str:
+        # never store the secret itself, only a digest that changes with it
+        return hashlib.sha256(f"reke-cache:{self.variant}:".encode() + self._secret.encode()).hexdigest()[:32]
+
+    def _check_secret(self):
+        """Invalidate everything if REKE_SECRET changed since the entries were written."""
+        if reke_sdk.REKE_SECRET == self._secret:
+            return
+        self._secret = reke_sdk.REKE_SECRET
+        self._mem.clear()
+        if self._db is not None:
+            self._db.execute("DELETE FROM verify_cache WHERE secret != ?", (self._fingerprint(),))
+
+    def get(self, kind: str, digest: str):
+        """Cached (status, manifest, sig_ok) for this content, or None."""
+        key = f"{kind}:{digest}"
+        now = time.time()
+        with self._lock:
+            self._check_secret()
+            entry = self._mem.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._mem.move_to_end(key)
+                    self._hits.inc()
+                    return entry[1]
+                del self._mem[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT result, expires FROM verify_cache WHERE key = ? AND secret = ?",
+                                       (key, self._fingerprint())).fetchone()
+                if row and row[1] > now:
+                    result = tuple(json.loads(row[0]))
+                    self._store(key, row[1], result)
+                    self._hits.inc()
+                    self._disk_hits.inc()
+                    return result
+            self._misses.inc()
+            return None
+
+    def put(self, kind: str, digest: str, result):
+        key = f"{kind}:{digest}"
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._check_secret()
+            self._store(key, expires, tuple(result))
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO verify_cache (key, secret, result, expires) VALUES (?, ?, ?, ?)",
+                                 (key, self._fingerprint(), json.dumps(list(result)), expires))
+
+    def _store(self, key: str, expires: float, result):
+        self._mem[key] = (expires, result)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+            self._evictions.inc()
+
+    def stats(self) -> dict:
+        hits, misses = self._hits.value, self._misses.value
+        lookups = hits + misses
+        return {'hits': hits, 'misses': misses, 'disk_hits': self._disk_hits.value,
+                'evictions': self._evictions.value, 'entries': len(self._mem),
+                'hit_rate': (hits / lookups) if lookups else 0.0}
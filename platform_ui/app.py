@@ -1,19 +1,99 @@
 # platform_ui/app.py
-import streamlit as st, requests, io
-from PIL import Image
+import streamlit as st, requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 API_BASE = st.secrets.get("REKE_API_URL", "http://localhost:8000").rstrip("/")
+# (connect, read) seconds; generous read timeout for a cold-starting API
+TIMEOUT = (5, 30)
+THUMB_WIDTH = 320
+GALLERY_WORKERS = 8
 
 st.set_page_config(page_title="Reke Platform Demo", page_icon="🛡️", layout="wide")
 st.title("🛡️ Reke Platform Demo — Sample Gallery")
 st.caption("Select a sample image below. Toggle the API to see the platform response.")
 
+@st.cache_resource
+def http_session() -> requests.Session:
+    """One keep-alive connection pool shared by every rerun and session."""
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 502, 503, 504),
+                  allowed_methods=frozenset({"GET", "POST"}), respect_retry_after_header=True)
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=GALLERY_WORKERS * 2, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def _get_bytes(path: str, **params) -> bytes:
+    r = http_session().get(f"{API_BASE}{path}", params=params or None, timeout=TIMEOUT)
+    r.raise_for_status()
+    return r.content
+
+def _mime(fn: str) -> str:
+    return 'image/png' if fn.lower().endswith('.png') else 'image/jpeg'
+
+class ApiError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"API error: {status_code}")
+        self.status_code = status_code
+
+# failures raise instead of returning, so st.cache_data never caches them
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_samples() -> list:
+    resp = http_session().get(f"{API_BASE}/samples", timeout=TIMEOUT)
+    resp.raise_for_status()
+    return resp.json().get("samples", [])
+
+def _thumb_or_full(fn: str):
+    """Preview bytes, or None when the sample is gone (404); other failures raise."""
+    # the full image is the fallback for APIs without thumbnails
+    for path, params in ((f"/sample/{fn}/thumb", {'w': THUMB_WIDTH}), (f"/sample/{fn}", {})):
+        try:
+            return _get_bytes(path, **params)
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 404:
+                raise
+    return None
+
+def _thumb_or_none(fn: str):
+    try:
+        return _thumb_or_full(fn)
+    except Exception:
+        return None
+
+@st.cache_data(ttl=600, show_spinner="Loading gallery…")
+def fetch_thumbnails(names: tuple) -> dict:
+    """Gallery previews, fetched concurrently over the pooled session."""
+    with ThreadPoolExecutor(max_workers=GALLERY_WORKERS) as pool:
+        return dict(zip(names, pool.map(_thumb_or_full, names)))
+
+def load_thumbnails(names: tuple) -> dict:
+    try:
+        return fetch_thumbnails(names)
+    except Exception:
+        # transient API error: show what loads now, uncached, and retry on the next rerun
+        with ThreadPoolExecutor(max_workers=GALLERY_WORKERS) as pool:
+            return dict(zip(names, pool.map(_thumb_or_none, names)))
+
+@st.cache_data(ttl=600, show_spinner=False)
+def fetch_sample(fn: str) -> bytes:
+    return _get_bytes(f"/sample/{fn}")
+
+@st.cache_data(ttl=300, show_spinner="Verifying…")
+def verify_sample(fn: str) -> dict:
+    """POST the sample to /verify/ and return the JSON verdict."""
+    files = {'file': (fn, fetch_sample(fn), _mime(fn))}
+    res = http_session().post(f"{API_BASE}/verify/", files=files, timeout=TIMEOUT)
+    if not res.ok:
+        raise ApiError(res.status_code)
+    return res.json()
+
 mode = st.radio("Platform mode:", ["Without Reke API", "With Reke API"], horizontal=True)
 
 # fetch samples list
 try:
-    resp = requests.get(f"{API_BASE}/samples", timeout=5)
-    all_samples = resp.json().get("samples", [])
+    all_samples = fetch_samples()
 except Exception:
     all_samples = []
 
@@ -24,18 +104,21 @@ ai_list = [fn for fn in all_samples if fn.lower().startswith("ai") or "ai_" in f
 others = [fn for fn in all_samples if fn not in real_list and fn not in ai_list]
 real_list += others
 
+thumbs = load_thumbnails(tuple(real_list + ai_list))
+
 def show_gallery(title, items):
     st.subheader(title)
     cols = st.columns(4)
     for idx, fn in enumerate(items):
         with cols[idx % 4]:
+            if thumbs.get(fn) is None:
+                st.write("Error loading", fn)
+                continue
+            if st.button(fn, key=title + "_" + fn):
+                st.session_state['selected'] = fn
             try:
-                r = requests.get(f"{API_BASE}/sample/{fn}", timeout=5)
-                img = Image.open(io.BytesIO(r.content))
-                if st.button(fn, key=title + "_" + fn):
-                    st.session_state['selected'] = fn
-                st.image(img, caption=fn, use_column_width=True)
-            except Exception:
+                st.image(thumbs[fn], caption=fn, use_column_width=True)
+            except Exception:  # bytes the image decoder rejects
                 st.write("Error loading", fn)
 
 if real_list:
@@ -47,31 +130,31 @@ st.markdown("---")
 sel = st.session_state.get('selected')
 if sel:
     st.header("Selected: " + sel)
-    r = requests.get(f"{API_BASE}/sample/{sel}", timeout=5)
-    img_bytes = r.content
+    try:
+        img_bytes = fetch_sample(sel)
+    except Exception as e:
+        st.error("Could not load sample: " + str(e))
+        st.stop()
     st.image(img_bytes, use_column_width=True)
     if mode == "Without Reke API":
         st.warning("❓ Unknown — platform has no verification integrated.")
     else:
-        # Call verify endpoint
-        files = {'file': (sel, img_bytes, 'image/png' if sel.lower().endswith('.png') else 'image/jpeg')}
+        # Call verify endpoint (cached per sample across reruns)
         try:
-            res = requests.post(f"{API_BASE}/verify/", files=files, timeout=10)
-            if res.ok:
-                data = res.json()
-                status = data.get('status', 'Unknown')
-                if status == "AI Generated":
-                    st.error("🟥 AI Generated — Watermark Found")
-                    st.json(data)
-                    st.warning("Download & browse disabled for AI-generated content.")
-                elif status == "Real":
-                    st.success("🟦 Real — No watermark found")
-                    st.json(data)
-                    st.download_button("⬇️ Download image", data=img_bytes, file_name=sel, mime='image/png' if sel.lower().endswith('.png') else 'image/jpeg')
-                else:
-                    st.info("❓ " + status); st.json(data)
+            data = verify_sample(sel)
+            status = data.get('status', 'Unknown')
+            if status == "AI Generated":
+                st.error("🟥 AI Generated — Watermark Found")
+                st.json(data)
+                st.warning("Download & browse disabled for AI-generated content.")
+            elif status == "Real":
+                st.success("🟦 Real — No watermark found")
+                st.json(data)
+                st.download_button("⬇️ Download image", data=img_bytes, file_name=sel, mime=_mime(sel))
             else:
-                st.error("API error: " + str(res.status_code))
+                st.info("❓ " + status); st.json(data)
+        except ApiError as e:
+            st.error(str(e))
         except Exception as e:
             st.error("Verification failed: " + str(e))
 else: